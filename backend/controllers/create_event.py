@@ -1,12 +1,13 @@
-from langchain_core.chat_models import ChatGroq
 from dotenv import load_dotenv
-import asyncio
 import os
 
+from utils.llm_gateway import complete
+
 load_dotenv()
 
-groq_api_key = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(api_key=groq_api_key, model="groq-alpha-001")
+# Groq through the gateway's OpenAI-compatible endpoint; 0.7 was ChatGroq's default
+GROQ_MODEL = os.getenv("GROQ_EVENT_SUMMARY_MODEL", "groq-alpha-001")
+GROQ_TEMPERATURE = 0.7
 
 async def create_event_summary(event_details: str) -> str:
     prompt = (
@@ -14,5 +15,4 @@ async def create_event_summary(event_details: str) -> str:
         f"{event_details}\n\n"
         "Summary:"
     )
-    return await llm.apredict(prompt)
-
+    return await complete(prompt, model=GROQ_MODEL, temperature=GROQ_TEMPERATURE, provider="groq")
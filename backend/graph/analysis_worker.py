@@ -0,0 +1,104 @@
+from typing import Any, Dict, List, Optional
+
+# Runs inside the analysis process pool. radon and pylint are called through
+# their Python APIs so each file costs a function call, not an interpreter
+# start-up plus a full pylint import. astroid's module cache stays warm
+# while a worker lints files of one checkout and is emptied when the next
+# file comes from another: workers are long-lived and see many unrelated
+# repos, so the cache would otherwise grow without bound and resolve one
+# team's imports against modules parsed from another team's checkout.
+
+PYLINT_ARGS = ["--score=y", "--persistent=n", "--reports=n"]
+MESSAGE_TYPES = ("fatal", "error", "warning", "refactor", "convention")
+
+# checkout whose modules are in this worker's astroid cache
+_astroid_root: Optional[str] = None
+
+
+def warm_imports():
+    # pool initializer: pay the import cost once per worker process
+    import radon.complexity  # noqa: F401
+    import radon.cli.tools  # noqa: F401
+    import pylint.lint  # noqa: F401
+    import pylint.reporters  # noqa: F401
+
+
+def _stat(stats: Any, name: str) -> int:
+    # pylint >= 2.12 exposes LinterStats attributes, older releases a dict
+    if isinstance(stats, dict):
+        return int(stats.get(name, 0) or 0)
+    return int(getattr(stats, name, 0) or 0)
+
+
+def radon_blocks(path: str) -> List[Dict[str, Any]]:
+    from radon.complexity import cc_visit
+    from radon.cli.tools import cc_to_dict
+
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        code = f.read()
+    try:
+        return [cc_to_dict(block) for block in cc_visit(code)]
+    except SyntaxError:
+        return []
+
+
+def _reset_astroid():
+    from astroid import MANAGER
+
+    if hasattr(MANAGER, "clear_cache"):
+        # also re-seeds the builtins module the inference needs
+        MANAGER.clear_cache()
+    else:
+        MANAGER.astroid_cache.clear()
+        MANAGER._mod_file_cache.clear()
+
+
+def pylint_counts(path: str, root: Optional[str] = None) -> Dict[str, int]:
+    from pylint.lint import Run
+    from pylint.reporters import CollectingReporter
+
+    global _astroid_root
+    if root is None or root != _astroid_root:
+        _reset_astroid()
+        _astroid_root = root
+
+    run = Run([path, *PYLINT_ARGS], reporter=CollectingReporter(), exit=False)
+    stats = run.linter.stats
+
+    counts = {t: _stat(stats, t) for t in MESSAGE_TYPES}
+    counts["statement"] = _stat(stats, "statement")
+    return counts
+
+
+def analyze_python_file(path: str, root: Optional[str] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"path": path, "radon": [], "pylint": None}
+    try:
+        out["radon"] = radon_blocks(path)
+    except Exception:
+        pass
+    try:
+        out["pylint"] = pylint_counts(path, root)
+    except Exception:
+        pass
+    return out
+
+
+def pylint_global_score(per_file: List[Dict[str, int]]) -> float:
+    """
+    Same formula pylint uses for the "rated at" line, applied to the summed
+    per-file message counts. Files pylint could not check (a fatal, usually a
+    syntax error) are left out rather than zeroing the whole repo; callers
+    list them separately.
+    """
+    totals = {t: 0 for t in MESSAGE_TYPES + ("statement",)}
+    for counts in per_file:
+        if counts.get("fatal"):
+            continue
+        for t in totals:
+            totals[t] += counts.get(t, 0)
+
+    if not totals["statement"]:
+        return 0.0
+
+    penalty = 5 * totals["error"] + totals["warning"] + totals["refactor"] + totals["convention"]
+    return round(max(0.0, 10.0 - (penalty / totals["statement"]) * 10), 2)
@@ -0,0 +1,178 @@
+import os
+import re
+import math
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from graph.repo_index import build_manifest
+
+# Picks which code the LLM reviewer sees. Files are ranked by how likely they
+# are to carry the project's own logic, then cut into token-sized chunks and
+# packed against a total token budget.
+
+CHUNK_EXTS = [".py", ".js", ".ts", ".html", ".css", ".cpp", ".java"]
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "12000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "1500"))
+MAX_CODE_CHUNKS = int(os.getenv("MAX_CODE_CHUNKS", "8"))
+MAX_CHUNKS_PER_FILE = int(os.getenv("MAX_CHUNKS_PER_FILE", "2"))
+# only the best candidates by path/size are opened for content scoring
+MAX_CANDIDATE_FILES = 60
+
+ENTRY_POINTS = {
+    "main", "app", "index", "server", "manage", "__main__", "cli", "run",
+    "api", "routes", "views", "models", "service", "handler", "controller",
+}
+# only directories that hold installed or generated code; static/, public/
+# and assets/ often carry the team's own frontend
+VENDOR_DIRS = {
+    "node_modules", "vendor", "dist", "build", ".venv", "venv", "site-packages",
+}
+LANGUAGE_WEIGHT = {
+    "python": 1.0, "javascript": 0.8, "typescript": 1.0, "java": 1.0,
+    "cpp": 1.0, "html": -0.5, "css": -1.0,
+}
+STOPWORDS = {
+    "this", "that", "with", "from", "into", "your", "their", "will", "have",
+    "project", "using", "based", "which", "where", "when", "what", "about",
+    "application", "system", "build", "built", "make", "uses", "user", "users",
+}
+BRANCH_RE = re.compile(r"\b(if|elif|else|for|while|case|switch|catch|except|try|return)\b")
+WORD_RE = re.compile(r"[a-z][a-z0-9]{3,}")
+
+
+# ------------ TOKENS ------------
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    enc = _encoder()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # ~4 characters per token for source code
+    return len(text) // 4 + 1
+
+
+# ------------ RANKING ------------
+def is_vendored(path: str) -> bool:
+    parts = path.lower().split("/")
+    name = parts[-1]
+    if any(p in VENDOR_DIRS for p in parts[:-1]):
+        return True
+    return ".min." in name or name.endswith(".bundle.js") or name.startswith("jquery")
+
+
+def keywords(desc: str) -> set:
+    return {w for w in WORD_RE.findall((desc or "").lower()) if w not in STOPWORDS}
+
+
+def path_score(entry: Dict[str, Any], desc_words: set) -> float:
+    path = entry["path"].lower()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    score = LANGUAGE_WEIGHT.get(entry.get("language"), 0.0)
+
+    if stem in ENTRY_POINTS:
+        score += 3.0
+    if "test" in path:
+        score -= 1.0
+    # shallow files are more often the project's own code
+    score -= 0.2 * path.count("/")
+
+    loc = entry.get("loc") or 0
+    if loc < 10:
+        score -= 2.0
+    else:
+        # grows with size, saturating around a few hundred lines
+        score += min(1.5, math.log10(loc) - 0.5)
+
+    score += 1.0 * min(2, sum(1 for w in desc_words if w in path))
+    return score
+
+
+def content_score(text: str, desc_words: set) -> float:
+    lines = max(1, text.count("\n"))
+    # branch density as a cheap stand-in for cyclomatic complexity
+    density = len(BRANCH_RE.findall(text)) / lines
+    score = min(1.5, density * 10)
+
+    if desc_words:
+        words = set(WORD_RE.findall(text.lower()))
+        score += 2.0 * len(desc_words & words) / len(desc_words)
+    return score
+
+
+# ------------ PACKING ------------
+def split_by_tokens(text: str, max_tokens: int) -> List[Tuple[str, int]]:
+    chunks, current, current_tokens = [], [], 0
+    for line in text.splitlines():
+        t = estimate_tokens(line) + 1
+        if current and current_tokens + t > max_tokens:
+            chunks.append(("\n".join(current), current_tokens))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += t
+    if current:
+        chunks.append(("\n".join(current), current_tokens))
+    return chunks
+
+
+def select_chunks(
+    manifest: Dict[str, Any],
+    exts: List[str],
+    desc: str = "",
+    max_chunks: int = MAX_CODE_CHUNKS,
+    token_budget: int = CHUNK_TOKEN_BUDGET,
+) -> List[str]:
+    desc_words = keywords(desc)
+
+    candidates = [
+        f for f in manifest["files"]
+        if f["path"].endswith(tuple(exts)) and not is_vendored(f["path"])
+    ]
+    candidates.sort(key=lambda f: path_score(f, desc_words), reverse=True)
+
+    ranked = []
+    for f in candidates[:MAX_CANDIDATE_FILES]:
+        try:
+            with open(os.path.join(manifest["root"], f["path"]), encoding="utf-8", errors="ignore") as fh:
+                text = fh.read()
+        except OSError:
+            continue
+        if not text.strip():
+            continue
+        score = path_score(f, desc_words) + content_score(text, desc_words)
+        ranked.append((score, f["path"], text))
+    ranked.sort(key=lambda r: r[0], reverse=True)
+
+    per_file = [
+        (path, split_by_tokens(text, CHUNK_TOKENS)[:MAX_CHUNKS_PER_FILE])
+        for _, path, text in ranked
+    ]
+
+    # breadth first: every ranked file gets its first chunk before any file
+    # gets a second one, so one big file cannot fill the whole budget
+    selected, used = [], 0
+    for depth in range(MAX_CHUNKS_PER_FILE):
+        for path, parts in per_file:
+            if len(selected) >= max_chunks:
+                return selected
+            if depth >= len(parts):
+                continue
+            text, tokens = parts[depth]
+            if used + tokens > token_budget:
+                continue
+            selected.append(f"# FILE: {path}\n{text}")
+            used += tokens
+
+    return selected
+
+
+def get_code_chunks(repo: str, manifest: Dict[str, Any] = None, desc: str = "") -> List[str]:
+    # analysis tool entry point (tool_pool): ranked by likely importance and
+    # packed against CHUNK_TOKEN_BUDGET
+    return select_chunks(manifest or build_manifest(repo), CHUNK_EXTS, desc)
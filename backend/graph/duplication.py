@@ -0,0 +1,151 @@
+import os
+import re
+import zlib
+from collections import deque, defaultdict
+from typing import Any, Dict, List, Tuple
+
+from graph.chunk_selector import is_vendored
+from graph.minhash import repo_signatures
+from graph.repo_index import build_manifest
+
+# In-repo copy/paste detection with winnowed k-gram fingerprints (the MOSS
+# scheme). Any duplicated run of at least WINDOW + K_GRAM - 1 tokens is
+# guaranteed to share a fingerprint, which puts the detection threshold close
+# to jscpd's default of 50 tokens.
+
+K_GRAM = 20
+WINDOW = 30
+MOD = (1 << 61) - 1
+BASE = 1_000_003
+
+TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d+(?:\.\d+)?|\S")
+
+
+def tokenize(text: str) -> List[Tuple[int, int]]:
+    """(token id, line number) pairs. Ids are crc32 so they are stable across processes."""
+    out = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        for tok in TOKEN_RE.findall(line):
+            out.append((zlib.crc32(tok.encode("utf-8")), lineno))
+    return out
+
+
+def kgram_hashes(token_ids: List[int], k: int = K_GRAM) -> List[int]:
+    if len(token_ids) < k:
+        return []
+    top = pow(BASE, k - 1, MOD)
+    h = 0
+    for t in token_ids[:k]:
+        h = (h * BASE + t) % MOD
+    hashes = [h]
+    for i in range(k, len(token_ids)):
+        h = ((h - token_ids[i - k] * top) * BASE + token_ids[i]) % MOD
+        hashes.append(h)
+    return hashes
+
+
+def winnow(hashes: List[int], window: int = WINDOW) -> List[Tuple[int, int]]:
+    """(hash, k-gram position) for the rightmost minimum of every window."""
+    picked = []
+    q: deque = deque()
+    last = -1
+    for i, h in enumerate(hashes):
+        while q and hashes[q[-1]] >= h:
+            q.pop()
+        q.append(i)
+        if q[0] <= i - window:
+            q.popleft()
+        if i >= window - 1 and q[0] != last:
+            last = q[0]
+            picked.append((hashes[last], last))
+    if hashes and not picked:
+        # shorter than one window: keep its minimum
+        i = min(range(len(hashes)), key=lambda j: hashes[j])
+        picked.append((hashes[i], i))
+    return picked
+
+
+def file_fingerprints(text: str) -> Dict[str, Any]:
+    """
+    Fingerprints of one file: [(hash, first line, last line)] plus its line
+    count. Plain data, so it can be cached per file and merged later.
+    """
+    tokens = tokenize(text)
+    hashes = kgram_hashes([t for t, _ in tokens])
+    prints = [
+        (h, tokens[pos][1], tokens[pos + K_GRAM - 1][1])
+        for h, pos in winnow(hashes)
+    ]
+    return {"lines": len(text.splitlines()), "fingerprints": prints}
+
+
+def duplication_from_fingerprints(files: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Marks every line covered by a fingerprint that occurs more than once in
+    the repository and reports the duplicated share of all lines, the way
+    jscpd's total percentage does.
+    """
+    locations = defaultdict(list)
+    for path, data in files.items():
+        for h, start, end in data["fingerprints"]:
+            locations[h].append((path, start, end))
+
+    duplicated = defaultdict(set)
+    pairs = defaultdict(int)
+    for locs in locations.values():
+        if len(locs) < 2:
+            continue
+        for path, start, end in locs:
+            duplicated[path].update(range(start, end + 1))
+        paths = sorted({p for p, _, _ in locs})
+        if len(paths) > 50:
+            # boilerplate shared by everything says nothing about pairs
+            continue
+        for i in range(len(paths)):
+            for j in range(i + 1, len(paths)):
+                pairs[(paths[i], paths[j])] += 1
+
+    total_lines = sum(d["lines"] for d in files.values())
+    dup_lines = sum(len(v) for v in duplicated.values())
+    percentage = round(dup_lines / total_lines * 100, 2) if total_lines else 0.0
+
+    clones = sorted(pairs.items(), key=lambda kv: kv[1], reverse=True)[:20]
+    return {
+        "percentage": percentage,
+        "duplicated_lines": dup_lines,
+        "total_lines": total_lines,
+        "clones": [{"a": a, "b": b, "shared_fingerprints": n} for (a, b), n in clones],
+    }
+
+
+def manifest_fingerprints(
+    manifest: Dict[str, Any], reuse: Dict[str, Dict[str, Any]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Fingerprints per manifest file; files found in `reuse` are not read again."""
+    reuse = reuse or {}
+    files = {}
+    for f in manifest["files"]:
+        if not f.get("language") or f.get("hash") is None or is_vendored(f["path"]):
+            continue
+        if f["path"] in reuse:
+            files[f["path"]] = reuse[f["path"]]
+            continue
+        try:
+            with open(os.path.join(manifest["root"], f["path"]), encoding="utf-8", errors="ignore") as fh:
+                files[f["path"]] = file_fingerprints(fh.read())
+        except OSError:
+            continue
+    return files
+
+
+def duplication_analysis(
+    repo: str, manifest: Dict[str, Any] = None, reuse: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    # analysis tool entry point (tool_pool). The same fingerprints feed the
+    # cross-team MinHash signatures and are kept for incremental
+    # re-evaluation.
+    fingerprints = manifest_fingerprints(manifest or build_manifest(repo), reuse)
+    report = duplication_from_fingerprints(fingerprints)
+    report["signatures"] = repo_signatures(fingerprints)
+    report["fingerprints"] = fingerprints
+    return report
@@ -0,0 +1,93 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from graph.analysis_worker import warm_imports
+
+# Two pools for the evaluation pipeline, so slow network work cannot starve
+# analysis and analysis does not fight over the GIL:
+#   io_pool  - threads for clone/fetch, git diff, disk walks, cleanup, PDFs
+#   cpu_pool - processes for per-file radon/pylint
+#   tool_pool - processes for the whole-repo tools (chunks, structure,
+#               duplication) and slide deck parsing; kept apart so a deep
+#               queue of lint tasks from other evaluations cannot eat
+#               into their deadlines
+# Each pool admits at most workers + queue limit tasks; further callers wait
+# for a slot instead of piling up an unbounded backlog.
+
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+IO_QUEUE_LIMIT = int(os.getenv("IO_QUEUE_LIMIT", "32"))
+# workers are long-lived and import radon/pylint once at start-up
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 2)))
+ANALYSIS_QUEUE_LIMIT = int(os.getenv("ANALYSIS_QUEUE_LIMIT", "256"))
+# three tools per evaluation; a few evaluations run their tools at once
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "4"))
+TOOL_QUEUE_LIMIT = int(os.getenv("TOOL_QUEUE_LIMIT", "32"))
+
+
+class BoundedPool:
+    def __init__(self, executor, workers: int, queue_limit: int):
+        self.executor = executor
+        self.capacity = workers + queue_limit
+        self.in_flight = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # created lazily so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        return self._slots
+
+    async def submit(self, fn: Callable, *args) -> asyncio.Future:
+        """Waits for a slot, then returns an awaitable for fn(*args)."""
+        slots = self._semaphore()
+        await slots.acquire()
+        try:
+            fut = asyncio.wrap_future(self.executor.submit(fn, *args))
+        except Exception:
+            slots.release()
+            raise
+
+        self.in_flight += 1
+
+        def release(_):
+            self.in_flight -= 1
+            slots.release()
+
+        fut.add_done_callback(release)
+        return fut
+
+    async def run(self, fn: Callable, *args) -> Any:
+        return await (await self.submit(fn, *args))
+
+    def stats(self) -> Dict[str, int]:
+        return {"capacity": self.capacity, "in_flight": self.in_flight}
+
+
+io_pool = BoundedPool(
+    ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="evalx-io"),
+    IO_WORKERS,
+    IO_QUEUE_LIMIT,
+)
+
+# spawn (not fork) because the parent already runs threads and an event loop
+cpu_pool = BoundedPool(
+    ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=warm_imports,
+    ),
+    ANALYSIS_WORKERS,
+    ANALYSIS_QUEUE_LIMIT,
+)
+
+tool_pool = BoundedPool(
+    ProcessPoolExecutor(
+        max_workers=TOOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    ),
+    TOOL_WORKERS,
+    TOOL_QUEUE_LIMIT,
+)
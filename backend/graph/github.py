@@ -6,23 +6,37 @@ import stat
 import shutil
 import tempfile
 import asyncio
-import subprocess
-from typing import List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Awaitable, Callable, Optional
+from functools import partial
 from fastapi.responses import StreamingResponse
-import base64
-import io
 
 import git
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import JSONResponse
 from datetime import datetime
-from openai import AsyncOpenAI
 
 # PDF generation (pip install reportlab)
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 
+from middlewares.auth_required import get_user as get_current_user
+from graph.repo_index import LANGUAGES, analyze_structure, build_manifest
+from graph.chunk_selector import VENDOR_DIRS, get_code_chunks, is_vendored
+from graph.duplication import duplication_analysis
+from graph.similarity_index import save_signatures
+from graph.analysis_worker import analyze_python_file, pylint_global_score
+from graph.executors import cpu_pool, io_pool, tool_pool
+from graph.jobs import enqueue_job, register_handler
+from graph.incremental import changed_files, chunk_key, load_state, reusable_state, save_state
+from utils.repo_cache import cached_checkout, checkout_worktree, fetch_mirror, mirror_path_for, normalize_repo_url
+from utils.result_store import evaluation_key, get_result, put_result
+from utils.report_store import open_report, save_report
+from utils.workspace import cleanup_stale_workspaces, sparse_patterns
+from utils.llm_gateway import chat, chat_json, close as close_gateway
+from utils.llm_scheduler import BULK, llm_context
+from utils.single_flight import normalize_text, payload_key
+from utils.markdown_stream import Emit
+
 OPEN_AI_KEY= os.getenv("OPENAI_API_KEY", "")
 
 
@@ -31,12 +45,28 @@ OPENAI_KEY = OPEN_AI_KEY
 if not OPENAI_KEY:
     raise RuntimeError("OPENAI_API_KEY missing")
 
-llm = AsyncOpenAI(api_key=OPEN_AI_KEY)
-executor = ThreadPoolExecutor(max_workers=6)
+# clone/fetch and other blocking I/O go to io_pool, repo-wide tools to
+# tool_pool and per-file radon/pylint to cpu_pool (see graph.executors)
+
+# Bump whenever prompts, weights or smell thresholds change so stored
+# evaluations from the previous rubric are not served again.
+RUBRIC_VERSION = "1"
 
 router = APIRouter(tags=["github-evaluator"])
 
 
+@router.on_event("startup")
+async def remove_stale_workspaces():
+    removed = await io_pool.run(cleanup_stale_workspaces)
+    if removed:
+        print("Removed stale workspaces:", removed)
+
+
+@router.on_event("shutdown")
+async def close_llm_gateway():
+    await close_gateway()
+
+
 # ------------ BASIC UTILS ------------
 def safe_rmtree(path: str):
     if not os.path.exists(path):
@@ -45,96 +75,106 @@ def safe_rmtree(path: str):
     shutil.rmtree(path, onerror=rm)
 
 
-def run_shell(cmd: list, timeout=30) -> str:
-    try:
-        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-        return out.stdout or ""
-    except:
-        return ""
+# radon + pylint tasks per evaluation
+STATIC_ANALYSIS_MAX_FILES = int(os.getenv("STATIC_ANALYSIS_MAX_FILES", "150"))
 
+# sparse checkout: only files the manifest indexes plus the structure markers
+CHECKOUT_PATTERNS = sparse_patterns(LANGUAGES.keys(), VENDOR_DIRS)
 
-def clone_repo(url: str) -> str:
-    repo_path = tempfile.mkdtemp(prefix="repo_")
-    safe_rmtree(repo_path)
-    git.Repo.clone_from(url, repo_path)
+
+def clone_repo(url: str, sha: str = None) -> str:
+    # incremental fetch into the local mirror, then a detached sparse worktree at HEAD
+    if sha:
+        return checkout_worktree(mirror_path_for(url), sha, CHECKOUT_PATTERNS)
+    repo_path, _ = cached_checkout(url, CHECKOUT_PATTERNS)
     return repo_path
 
 
 # ------------ REPO SCAN ------------
-def get_code_chunks(repo: str) -> List[str]:
-    exts = [".py", ".js", ".ts", ".html", ".css", ".cpp", ".java"]
-    chunks = []
-
-    for root, _, files in os.walk(repo):
-        if ".git" in root:
-            continue
-        for file in files:
-            if not any(file.endswith(x) for x in exts):
-                continue
-            full = os.path.join(root, file)
-            try:
-                text = open(full, encoding="utf-8", errors="ignore").read()
-            except:
-                continue
-
-            parts = text.splitlines()
-            for i in range(0, len(parts), 300):
-                chunks.append(f"# FILE: {file}\n" + "\n".join(parts[i:i+300]))
-
-    return chunks[:8]
-
-
-def analyze_structure(repo: str) -> Dict:
-    out = {
-        "has_readme": False,
-        "has_requirements": False,
-        "has_tests": False,
-        "has_dockerfile": False,
-        "has_github_actions": False,
-        "file_count": 0,
-        "dir_count": 0,
-    }
-
-    for root, dirs, files in os.walk(repo):
-        out["dir_count"] += len(dirs)
-        out["file_count"] += len(files)
-
-        for file in files:
-            name = file.lower()
-            if name.startswith("readme"):
-                out["has_readme"] = True
-            if name in ("requirements.txt", "pyproject.toml", "setup.py"):
-                out["has_requirements"] = True
-            if name == "dockerfile":
-                out["has_dockerfile"] = True
-            if "tests" in root.lower():
-                out["has_tests"] = True
-            if ".github/workflows" in root.replace("\\", "/"):
-                out["has_github_actions"] = True
-
-    return out
-
+# All scans read the manifest from graph.repo_index instead of walking the
+# checkout again; passing none builds one on the spot.
+def python_files(repo: str, manifest: Dict[str, Any] = None) -> List[str]:
+    """
+    Python files to lint: vendored code (a committed venv/ or
+    site-packages/) is left out, and above STATIC_ANALYSIS_MAX_FILES only
+    the largest files are kept, so one repo cannot fill cpu_pool.
+    """
+    manifest = manifest or build_manifest(repo)
+    files = [
+        f for f in manifest["files"]
+        if f["path"].endswith(".py") and not is_vendored(f["path"])
+    ]
+    files.sort(key=lambda f: (-(f["loc"] or 0), f["path"]))
+    return [os.path.join(manifest["root"], f["path"]) for f in files[:STATIC_ANALYSIS_MAX_FILES]]
+
+
+async def submit_static_analysis(
+    repo: str, manifest: Dict[str, Any], skip: Dict[str, Any] = None
+) -> List[Any]:
+    # one radon + pylint task per file, linted in parallel across the pool;
+    # files in `skip` (relative paths) already have results
+    skip = skip or {}
+    return [
+        await cpu_pool.submit(analyze_python_file, f, repo)
+        for f in python_files(repo, manifest)
+        if os.path.relpath(f, repo) not in skip
+    ]
 
-def static_analysis(repo: str):
-    radon_raw = run_shell(["radon", "cc", repo, "-s", "-j"], timeout=15)
-    pylint_score = 0.0
 
-    try:
-        out = run_shell(["pylint", repo, "--score=y"], timeout=25)
-        if "rated at" in out:
-            pylint_score = float(out.split("rated at ")[1].split("/")[0])
-    except:
-        pass
+async def gather_static_analysis(repo: str, futures: List[Any], deadline: float):
+    """
+    Raw per-file results {relative path: {"radon", "pylint"}}. Files that
+    miss the deadline (event loop time) are left out; the bool return tells
+    whether that happened.
+    """
+    loop = asyncio.get_event_loop()
+    per_file: Dict[str, Dict[str, Any]] = {}
+    complete = True
+
+    for fut in futures:
+        try:
+            item = await asyncio.wait_for(fut, max(0.0, deadline - loop.time()))
+        except Exception:
+            fut.cancel()
+            complete = False
+            continue
+        per_file[os.path.relpath(item["path"], repo)] = {
+            "radon": item["radon"],
+            "pylint": item["pylint"],
+        }
 
-    return radon_raw, pylint_score
+    return per_file, complete
+
+
+def summarize_static_analysis(per_file: Dict[str, Dict[str, Any]]):
+    """
+    Merges per-file results into radon's `cc -j` JSON (what
+    detect_code_smells reads), the repo-wide pylint score and a per-file
+    summary, one {"path", ...} record per file since paths contain dots
+    and cannot be Mongo keys.
+    """
+    radon_data: Dict[str, Any] = {}
+    pylint_counts: List[Dict[str, int]] = []
+    files: List[Dict[str, Any]] = []
+
+    for rel, item in per_file.items():
+        blocks = item["radon"]
+        counts = item["pylint"]
+        if blocks:
+            radon_data[rel] = blocks
+        if counts:
+            pylint_counts.append(counts)
+
+        complexities = [b.get("complexity", 0) for b in blocks]
+        files.append({
+            "path": rel,
+            "blocks": len(blocks),
+            "max_complexity": max(complexities, default=0),
+            "messages": counts,
+        })
 
-
-def plagiarism_score(repo: str) -> float:
-    out = run_shell(["npx", "jscpd", repo, "--reporters", "json"], timeout=25)
-    try:
-        return json.loads(out)["statistics"]["total"]["percentage"]
-    except:
-        return 0.0
+    radon_raw = json.dumps(radon_data) if radon_data else ""
+    return radon_raw, pylint_global_score(pylint_counts), files
 
 
 # ------------ CODE SMELL DETECTION ------------
@@ -219,39 +259,111 @@ def compute_risk_score(plag: float, pylint_score: float, code_smells: Dict[str,
 
 
 # ------------ LLM EVAL ------------
-async def llm_code_rating(desc: str, chunks: List[str]):
-    logic, relevance, style = [], [], []
-    feedback = []
-
-    for c in chunks:
-        prompt = {
-            "role": "user",
-            "content": (
-                "Rate this code strictly. Return JSON only:\n"
-                '{"logic":80,"relevance":85,"style":75,"feedback":"..."}\n\n'
-                f"PROJECT: {desc}\nCODE:\n{c}"
-            )
-        }
+MAX_CONCURRENT_CHUNKS = int(os.getenv("MAX_CONCURRENT_CHUNKS", "4"))
+# >1 packs several chunks into a single structured-JSON request
+CHUNKS_PER_REQUEST = int(os.getenv("CHUNKS_PER_REQUEST", "1"))
+
+
+async def rate_chunk(desc: str, chunk: str) -> Dict[str, Any]:
+    prompt = {
+        "role": "user",
+        "content": (
+            "Rate this code strictly. Return JSON only:\n"
+            '{"logic":80,"relevance":85,"style":75,"feedback":"..."}\n\n'
+            f"PROJECT: {desc}\nCODE:\n{chunk}"
+        )
+    }
+
+    return await chat_json([prompt], model="gpt-4o-mini", temperature=0)
+
 
-        res = await llm.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0,
-            messages=[prompt],
-            response_format={"type": "json_object"}
+async def rate_chunk_batch(desc: str, batch: List[str]) -> List[Dict[str, Any]]:
+    code = "\n\n".join(
+        f"=== CHUNK {i + 1} ===\n{c}" for i, c in enumerate(batch)
+    )
+    prompt = {
+        "role": "user",
+        "content": (
+            "Rate each code chunk below strictly and independently. Return JSON only:\n"
+            '{"ratings":[{"chunk":1,"logic":80,"relevance":85,"style":75,"feedback":"..."}]}\n'
+            f"Return exactly {len(batch)} ratings, one per chunk number.\n\n"
+            f"PROJECT: {desc}\nCODE:\n{code}"
         )
+    }
 
-        data = json.loads(res.choices[0].message.content)
+    content = await chat([prompt], model="gpt-4o-mini", temperature=0, json_mode=True)
 
-        logic.append(data.get("logic", 70))
-        relevance.append(data.get("relevance", 70))
-        style.append(data.get("style", 70))
-        feedback.append(data.get("feedback", ""))
+    by_chunk = {}
+    try:
+        for item in json.loads(content).get("ratings", []):
+            by_chunk[int(item.get("chunk"))] = item
+    except Exception:
+        pass
+
+    # anything the model dropped or mangled is re-rated on its own
+    ratings = []
+    for i, c in enumerate(batch):
+        ratings.append(by_chunk.get(i + 1) or await rate_chunk(desc, c))
+    return ratings
+
+
+async def rate_chunks(
+    desc: str,
+    chunks: List[str],
+    batch_size: int = CHUNKS_PER_REQUEST,
+    on_rated: Optional[Callable[[int, int, Dict[str, Any]], Awaitable[None]]] = None,
+) -> List[Dict[str, Any]]:
+    sem = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
+    batch_size = max(1, batch_size)
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    rated = 0
+
+    async def run(batch: List[str]) -> List[Dict[str, Any]]:
+        nonlocal rated
+        async with sem:
+            if len(batch) == 1:
+                ratings = [await rate_chunk(desc, batch[0])]
+            else:
+                ratings = await rate_chunk_batch(desc, batch)
+        if on_rated:
+            for r in ratings:
+                rated += 1
+                await on_rated(rated, len(chunks), r)
+        return ratings
+
+    # gather keeps batch order, so ratings line up with chunks
+    results = await asyncio.gather(*(run(b) for b in batches))
+    return [r for batch in results for r in batch]
+
+
+# what a chunk without a parsable rating counts as
+NEUTRAL_RATING = 70
+
+
+def aggregate_ratings(ratings: List[Dict[str, Any]]):
+    if not ratings:
+        # no code chunks to rate (empty or docs-only repo)
+        return NEUTRAL_RATING, NEUTRAL_RATING, NEUTRAL_RATING, []
+
+    logic = [r.get("logic", NEUTRAL_RATING) for r in ratings]
+    relevance = [r.get("relevance", NEUTRAL_RATING) for r in ratings]
+    style = [r.get("style", NEUTRAL_RATING) for r in ratings]
+    feedback = [r.get("feedback", "") for r in ratings]
 
     return sum(logic)/len(logic), sum(relevance)/len(relevance), sum(style)/len(style), feedback
 
 
+async def llm_code_rating(
+    desc: str,
+    chunks: List[str],
+    batch_size: int = CHUNKS_PER_REQUEST,
+    on_rated: Optional[Callable[[int, int, Dict[str, Any]], Awaitable[None]]] = None,
+):
+    return aggregate_ratings(await rate_chunks(desc, chunks, batch_size, on_rated))
+
+
 # ------------ MARKDOWN MENTOR ------------
-async def generate_markdown_mentor(desc: str, result: dict) -> str:
+async def generate_markdown_mentor(desc: str, result: dict, on_delta: Optional[Emit] = None) -> str:
     system = (
         "You are a senior software architect.\n"
         "Return STRICT MARKDOWN in this structure:\n\n"
@@ -290,20 +402,21 @@ async def generate_markdown_mentor(desc: str, result: dict) -> str:
 
     user = f"Project: {desc}\nEvaluation JSON:\n{json.dumps(result, indent=2)}"
 
-    res = await llm.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
+    return await chat(
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user}
-        ]
+        ],
+        model="gpt-4o-mini",
+        temperature=0,
+        on_delta=on_delta,
     )
 
-    return res.choices[0].message.content
-
 
 # ------------ AI REWRITE SUGGESTIONS ------------
-async def generate_rewrite_suggestions(desc: str, chunks: List[str], code_smells: Dict[str, Any]) -> str:
+async def generate_rewrite_suggestions(
+    desc: str, chunks: List[str], code_smells: Dict[str, Any], on_delta: Optional[Emit] = None
+) -> str:
     focus = "\n\n".join(chunks[:3])
 
     system = (
@@ -329,17 +442,16 @@ async def generate_rewrite_suggestions(desc: str, chunks: List[str], code_smells
         f"CODE SNIPPETS:\n{focus}"
     )
 
-    res = await llm.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0,
-        messages=[
+    return await chat(
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user}
-        ]
+        ],
+        model="gpt-4o-mini",
+        temperature=0,
+        on_delta=on_delta,
     )
 
-    return res.choices[0].message.content
-
 
 # ------------ GRADING RUBRIC ------------
 def rubric_from_score(score: float) -> Dict[str, Any]:
@@ -444,47 +556,210 @@ def generate_pdf_report(result: Dict[str, Any]) -> bytes:
     return data
 
 
-# ------------ BLOCKING ORCHESTRATOR (NO LLM) ------------
-def evaluate_repo_blocking(url: str, desc: str):
-    repo = clone_repo(url)
-    try:
-        chunks = get_code_chunks(repo)
-        radon_raw, pylint_score = static_analysis(repo)
-        plag = plagiarism_score(repo)
-        structure = analyze_structure(repo)
+# ------------ ANALYSIS ORCHESTRATOR (NO LLM) ------------
+# The DAG is clone -> manifest -> {tools}: the tools are independent of each
+# other and all read the same single-pass manifest. Each entry is
+# (function, timeout in seconds, fallback or None when required).
+ANALYSIS_TOOLS = {
+    "chunks": (get_code_chunks, 30, None),
+    "structure": (analyze_structure, 30, None),
+    "duplication": (
+        duplication_analysis,
+        30,
+        {"percentage": 0.0, "clones": [], "signatures": {"repo": None, "files": {}}, "fingerprints": {}},
+    ),
+}
+STATIC_ANALYSIS_TIMEOUT = 45
+
+
+async def run_analysis_tools(repo: str, desc: str = "", reuse: Dict[str, Any] = None):
+    """
+    Indexes the checkout once, then runs all ANALYSIS_TOOLS on tool_pool and
+    the per-file radon/pylint tasks on cpu_pool, in parallel. Only the event
+    loop waits on them, no thread is held for the duration. Tool deadlines
+    count from submission, so time spent building the manifest or waiting
+    behind lint tasks is not charged to them. A tool that fails or
+    misses its deadline contributes its fallback value and is listed in the
+    returned `failed` names; required tools re-raise instead. `reuse` holds
+    per-file results of unchanged files (graph.incremental), which are
+    merged in instead of being recomputed.
+    """
+    loop = asyncio.get_event_loop()
+    reuse = reuse or {}
+    manifest = await io_pool.run(build_manifest, repo)
+    tools = {n: fn for n, (fn, _, _) in ANALYSIS_TOOLS.items()}
+    # chunk selection also ranks files by relevance to the description
+    tools["chunks"] = partial(get_code_chunks, desc=desc)
+    tools["duplication"] = partial(duplication_analysis, reuse=reuse.get("fingerprints"))
+    futures = {
+        name: await tool_pool.submit(fn, repo, manifest)
+        for name, fn in tools.items()
+    }
+    start = loop.time()
+    # unchanged files keep their results, deleted ones drop out with the manifest
+    current = {os.path.relpath(p, repo) for p in python_files(repo, manifest)}
+    reused_static = {p: v for p, v in reuse.get("static", {}).items() if p in current}
+    static_futures = await submit_static_analysis(repo, manifest, skip=reused_static)
+
+    results, failed = {}, []
+    for name, fut in futures.items():
+        _, timeout, fallback = ANALYSIS_TOOLS[name]
+        remaining = max(0.0, timeout - (loop.time() - start))
+        try:
+            results[name] = await asyncio.wait_for(fut, remaining)
+        except Exception:
+            fut.cancel()
+            if fallback is None:
+                raise
+            results[name] = fallback
+            failed.append(name)
+
+    per_file, complete = await gather_static_analysis(
+        repo, static_futures, start + STATIC_ANALYSIS_TIMEOUT
+    )
+    per_file.update(reused_static)
+    radon_raw, pylint_score, static_files = summarize_static_analysis(per_file)
+    results["radon"] = radon_raw
+    results["pylint"] = pylint_score
+    results["static_files"] = static_files
+    results["static_per_file"] = per_file
+    # left out of the pylint score
+    results["pylint_fatal_files"] = sorted(
+        f["path"] for f in static_files if (f["messages"] or {}).get("fatal")
+    )
+    if not complete:
+        failed.append("static_analysis")
+
+    return results, failed
+
 
-        return repo, chunks, radon_raw, pylint_score, plag, structure
+async def evaluate_repo_static(url: str, desc: str, sha: str = None, reuse: Dict[str, Any] = None):
+    repo = await io_pool.run(clone_repo, url, sha)
+    try:
+        results, failed = await run_analysis_tools(repo, desc, reuse)
+        return repo, results, failed
     except Exception as e:
-        safe_rmtree(repo)
+        await io_pool.run(safe_rmtree, repo)
         raise e
 
 
-# ------------ FASTAPI ENDPOINT ------------
-@router.post("/evaluate")
-async def evaluate_repo(request: Request):
+# ------------ FULL PIPELINE ------------
+StageCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+# batching interval for streamed mentor / rewrite markdown in job events
+MARKDOWN_FLUSH_SECONDS = float(os.getenv("MARKDOWN_FLUSH_SECONDS", "0.5"))
+
+
+async def _emit(on_stage: Optional[StageCallback], stage: str, data: Dict[str, Any] = None):
+    if on_stage:
+        await on_stage(stage, data or {})
+
+
+def _stage_deltas(on_stage: Optional[StageCallback], stage: str):
+    """
+    Streamed markdown as `<stage>_delta` events. The first piece goes out at
+    once; later ones are batched so a long answer is a handful of job
+    updates rather than one per token. Returns (on_delta, flush).
+    """
+    pending: List[str] = []
+    last_flush = 0.0
+
+    async def flush():
+        nonlocal last_flush
+        if pending:
+            last_flush = time.monotonic()
+            text = "".join(pending)
+            pending.clear()
+            await _emit(on_stage, stage + "_delta", {"text": text})
+
+    async def on_delta(piece: str):
+        pending.append(piece)
+        if time.monotonic() - last_flush >= MARKDOWN_FLUSH_SECONDS:
+            await flush()
+
+    if on_stage is None:
+        return None, flush
+    return on_delta, flush
+
+
+async def run_evaluation(url: str, desc: str, on_stage: Optional[StageCallback] = None) -> Dict[str, Any]:
+    """
+    Clone + static analysis + LLM review + report for one repository.
+    Results are stored by (commit SHA, description, rubric version), so an
+    unchanged repo is answered from the store without any work, and a new
+    commit only re-analyses and re-rates the files changed since the last
+    evaluated one. `on_stage` is awaited with (stage, partial data) as each
+    stage finishes.
+    """
+    mirror, sha = await io_pool.run(fetch_mirror, url)
+    key = evaluation_key(sha, desc, RUBRIC_VERSION)
+    await _emit(on_stage, "cloned", {"commit_sha": sha})
+
+    stored = await get_result(key)
+    if stored:
+        await _emit(on_stage, "cached", {"evaluation_key": key})
+        return stored
+
+    reuse = None
+    previous = await load_state(url)
+    if previous:
+        changed = await io_pool.run(changed_files, mirror, previous["commitSha"], sha)
+        if changed is not None:
+            reuse = reusable_state(previous, changed)
+
+    repo, analysis, failed = await evaluate_repo_static(url, desc, sha, reuse)
+    chunks = analysis["chunks"]
+    radon_raw = analysis["radon"]
+    pylint_score = analysis["pylint"]
+    plag = analysis["duplication"]["percentage"]
+    structure = analysis["structure"]
+    rewrite_task = None
+
     try:
-        data = await request.json()
-    except:
-        raise HTTPException(400, "Invalid or empty JSON body")
+        if analysis["duplication"]["signatures"]["repo"]:
+            await save_signatures(sha, analysis["duplication"]["signatures"])
 
-    url = data.get("github_url")
-    desc = data.get("project_desc", "")
+        await _emit(on_stage, "static_analysis", {
+            "structure": structure,
+            "pylint_score": pylint_score,
+            "plagiarism": plag,
+            "incomplete_analysis": failed,
+            "incremental_from": previous["commitSha"] if reuse else None,
+        })
 
-    if not url:
-        raise HTTPException(400, "github_url required")
+        # LLM dependency graph:
+        #   code smells -> rewrite suggestions
+        #   chunk ratings + code smells -> scores -> mentor summary
+        # smells come from static analysis alone, so the rewrite call runs
+        # alongside chunk rating instead of after the mentor summary.
+        code_smells = detect_code_smells(radon_raw, pylint_score, plag, structure)
 
-    loop = asyncio.get_event_loop()
-    repo, chunks, radon_raw, pylint_score, plag, structure = await loop.run_in_executor(
-        executor,
-        evaluate_repo_blocking,
-        url,
-        desc
-    )
+        async def rewrite() -> str:
+            on_delta, flush = _stage_deltas(on_stage, "rewrite")
+            md = await generate_rewrite_suggestions(desc, chunks, code_smells, on_delta)
+            await flush()
+            await _emit(on_stage, "rewrite", {"rewrite_suggestions_markdown": md})
+            return md
 
-    try:
-        logic, rel, style, llm_fb = await llm_code_rating(desc, chunks)
+        rewrite_task = asyncio.create_task(rewrite())
+
+        async def on_rated(done: int, total: int, rating: Dict[str, Any]):
+            await _emit(on_stage, "chunk_rated", {"rated": done, "total": total, "rating": rating})
+
+        # chunks of unchanged files keep their text and therefore their rating
+        known = reuse["ratings"] if reuse else {}
+        keys = [chunk_key(desc, c, RUBRIC_VERSION) for c in chunks]
+        todo = [c for c, k in zip(chunks, keys) if k not in known]
+        fresh = iter(await rate_chunks(desc, todo, on_rated=on_rated))
+        ratings = [known[k] if k in known else next(fresh) for k in keys]
+
+        logic, rel, style, llm_fb = aggregate_ratings(ratings)
+        await _emit(on_stage, "llm_rating", {
+            "logic": logic,
+            "relevance": rel,
+            "style": style,
+            "reused_ratings": len(chunks) - len(todo),
+        })
 
-        code_smells = detect_code_smells(radon_raw, pylint_score, plag, structure)
         risk_score = compute_risk_score(plag, pylint_score, code_smells, structure)
         final_score = compute_final_score(plag, logic, rel, style, pylint_score, structure)
         rubric = rubric_from_score(final_score)
@@ -502,48 +777,114 @@ async def evaluate_repo(request: Request):
             "code_smells": code_smells,
             "llm_feedback": llm_fb,
             "files_analyzed": len(chunks),
+            "incomplete_analysis": failed,
         }
 
-        mentor_md = await generate_markdown_mentor(desc, result)
+        on_delta, flush = _stage_deltas(on_stage, "mentor")
+        mentor_md = await generate_markdown_mentor(desc, result, on_delta)
+        await flush()
         result["mentor_summary_markdown"] = mentor_md
+        await _emit(on_stage, "mentor", {"mentor_summary_markdown": mentor_md})
+
+        result["rewrite_suggestions_markdown"] = await rewrite_task
+
+        # per-file detail stays out of the mentor prompt
+        result["static_files"] = analysis["static_files"]
+        result["pylint_fatal_files"] = analysis["pylint_fatal_files"]
+        result["duplicate_files"] = analysis["duplication"]["clones"]
+
+        try:
+            await save_state(
+                url,
+                sha,
+                analysis["static_per_file"],
+                analysis["duplication"]["fingerprints"],
+                [{"key": k, "rating": r} for k, r in zip(keys, ratings)],
+            )
+        except Exception as e:
+            print("file state save error:", e)
 
-        rewrite_suggestions_md = await generate_rewrite_suggestions(desc, chunks, code_smells)
-        result["rewrite_suggestions_markdown"] = rewrite_suggestions_md
+        # the PDF is rendered on first download; results only keep a link
+        result["report_url"] = f"/download-report/{key}"
+        await _emit(on_stage, "report", {"report_url": result["report_url"]})
 
-        pdf_bytes = generate_pdf_report(result)
-        result["report_pdf_base64"] = base64.b64encode(pdf_bytes).decode("utf-8")
+    finally:
+        if rewrite_task and not rewrite_task.done():
+            rewrite_task.cancel()
+        await io_pool.run(safe_rmtree, repo)
 
-        return JSONResponse(result)
+    result["commit_sha"] = sha
+    result["evaluation_key"] = key
+    await put_result(key, sha, RUBRIC_VERSION, result)
+
+    return result
 
-    finally:
-        safe_rmtree(repo)
 
-@router.get("/download-report/{evaluation_id}")
-async def download_pdf_report(evaluation_id: str):
+# ------------ FASTAPI ENDPOINT ------------
+@router.post("/evaluate")
+async def evaluate_repo(request: Request, user=Depends(get_current_user)):
     try:
-        obj_id = ObjectId(evaluation_id)
+        data = await request.json()
     except:
-        raise HTTPException(400, "Invalid evaluation_id")
+        raise HTTPException(400, "Invalid or empty JSON body")
 
-    record = db["github_evaluations"].find_one({"_id": obj_id})
-    if not record:
-        raise HTTPException(404, "Evaluation not found")
+    url = data.get("github_url")
+    desc = data.get("project_desc", "")
 
-    result = record.get("result")
-    if not result or "report_pdf_base64" not in result:
-        raise HTTPException(400, "PDF is not generated for this evaluation")
+    if not url:
+        raise HTTPException(400, "github_url required")
 
-    pdf_base64 = result["report_pdf_base64"]
+    # clone + analysis + LLM calls take minutes; hand them to the job workers.
+    # The same user asking for the same repo and description while it is
+    # queued or running gets that job; the job is only readable by them.
+    dedupe_key = payload_key("evaluate", {
+        "github_url": normalize_repo_url(url),
+        "project_desc": normalize_text(desc),
+        "userId": user["id"],
+    })
+    job_id = await enqueue_job(
+        "evaluate", {"github_url": url, "project_desc": desc, "userId": user["id"]}, dedupe_key
+    )
+    return JSONResponse(
+        {
+            "success": True,
+            "jobId": job_id,
+            "statusUrl": f"/jobs/{job_id}",
+            "eventsUrl": f"/jobs/{job_id}/events",
+        },
+        status_code=202,
+    )
+
+
+async def run_evaluate_job(job: Dict[str, Any], report: StageCallback) -> Dict[str, Any]:
+    payload = job["payload"]
+    with llm_context(priority=BULK):
+        return await run_evaluation(payload["github_url"], payload.get("project_desc", ""), report)
 
-    try:
-        pdf_bytes = base64.b64decode(pdf_base64)
-    except:
-        raise HTTPException(500, "Invalid PDF data")
+
+register_handler("evaluate", run_evaluate_job)
+
+
+@router.get("/download-report/{report_key}")
+async def download_pdf_report(report_key: str):
+    chunks = await open_report(report_key)
+
+    if chunks is None:
+        result = await get_result(report_key)
+        if not result:
+            raise HTTPException(404, "Evaluation not found")
+
+        pdf_bytes = await io_pool.run(generate_pdf_report, result)
+        try:
+            await save_report(report_key, pdf_bytes)
+        except Exception as e:
+            print("report store error:", e)
+        chunks = iter([pdf_bytes])
 
     return StreamingResponse(
-        io.BytesIO(pdf_bytes),
+        chunks,
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f"attachment; filename=evaluation_report_{evaluation_id}.pdf"
+            "Content-Disposition": f"attachment; filename=evaluation_report_{report_key[:12]}.pdf"
         }
-    )
\ No newline at end of file
+    )
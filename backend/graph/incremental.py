@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import ASCENDING, DESCENDING
+
+from config.db import db
+from utils.repo_cache import mirror_git, normalize_repo_url
+
+# Per-file evaluation state of the last commit seen for each repository:
+# radon/pylint results, duplication fingerprints and LLM chunk ratings.
+# When the repo is evaluated again, files outside `git diff old..new` are
+# taken from here and only changed files are analysed and re-rated.
+
+file_state_collection = db["repo_file_state"]
+_indexes_ready = False
+
+
+def chunk_key(desc: str, chunk: str, rubric_version: str) -> str:
+    # a rating depends on the chunk text, the project description and the prompt
+    raw = "\x00".join([rubric_version, (desc or "").strip(), chunk])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def changed_files(mirror: str, old_sha: str, new_sha: str) -> Optional[Set[str]]:
+    """
+    Paths added, modified or deleted between two commits, or None when the
+    diff cannot be taken (e.g. the old commit was force-pushed away).
+    """
+    if old_sha == new_sha:
+        return set()
+    try:
+        out = mirror_git(mirror).diff("--name-only", "--no-renames", old_sha, new_sha)
+    except Exception as e:
+        print("git diff error:", e)
+        return None
+    return {line for line in out.splitlines() if line}
+
+
+async def _ensure_indexes():
+    # one state per (repo, commit): forks at the same sha keep separate entries
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    await file_state_collection.create_index(
+        [("repo", ASCENDING), ("commitSha", ASCENDING)], unique=True
+    )
+    await file_state_collection.create_index([("repo", ASCENDING), ("createdAt", DESCENDING)])
+    _indexes_ready = True
+
+
+async def load_state(url: str) -> Optional[Dict[str, Any]]:
+    await _ensure_indexes()
+    return await file_state_collection.find_one(
+        {"repo": normalize_repo_url(url)}, sort=[("createdAt", -1)]
+    )
+
+
+def reusable_state(state: Dict[str, Any], changed: Set[str]) -> Dict[str, Any]:
+    """Everything in `state` that does not touch a changed path."""
+    return {
+        "static": {
+            f["path"]: {"radon": f["radon"], "pylint": f["pylint"]}
+            for f in state.get("static", [])
+            if f["path"] not in changed
+        },
+        "fingerprints": {
+            f["path"]: {"lines": f["lines"], "fingerprints": f["fingerprints"]}
+            for f in state.get("fingerprints", [])
+            if f["path"] not in changed
+        },
+        # keyed by content, so a changed chunk never matches an old key
+        "ratings": {r["key"]: r["rating"] for r in state.get("ratings", [])},
+    }
+
+
+async def save_state(
+    url: str,
+    commit_sha: str,
+    static: Dict[str, Dict[str, Any]],
+    fingerprints: Dict[str, Dict[str, Any]],
+    ratings: List[Dict[str, Any]],
+):
+    repo = normalize_repo_url(url)
+    await _ensure_indexes()
+    # Mongo keys cannot contain dots, so per-file maps are stored as lists
+    await file_state_collection.replace_one(
+        {"repo": repo, "commitSha": commit_sha},
+        {
+            "repo": repo,
+            "commitSha": commit_sha,
+            "static": [{"path": p, **v} for p, v in static.items()],
+            "fingerprints": [{"path": p, **v} for p, v in fingerprints.items()],
+            "ratings": ratings,
+            "createdAt": datetime.utcnow(),
+        },
+        upsert=True,
+    )
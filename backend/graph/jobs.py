@@ -0,0 +1,377 @@
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config.db import db
+from middlewares.auth_required import get_user as get_current_user
+from utils.serializers import serialize_doc
+
+# Durable background jobs for long evaluations. Jobs are Mongo documents, so
+# a restart picks up whatever was queued or left running. Modules register a
+# handler per job kind; the handler receives the job and a `report(stage,
+# data)` callback for progress. Every report is appended to the job's
+# `stages` with its partial data, which is what the SSE stream replays,
+# except live text (`*_delta` stages): that is only handed to the streams
+# open in this process, and the full text arrives with the stage's own
+# event.
+# A job enqueued with a dedupe key shares the queued or running job that
+# already holds that key; the key is released when the job finishes.
+# A handler may come with an `on_failure(job, error)` callback that marks
+# whatever the job was working on (a submission, a bulk run) as failed. It
+# runs both when the handler raises and when the job is abandoned after
+# MAX_JOB_ATTEMPTS dead workers.
+
+EVALUATION_WORKERS = int(os.getenv("EVALUATION_WORKERS", "4"))
+JOB_POLL_INTERVAL = 5
+JOB_HEARTBEAT_INTERVAL = 30
+# a running job without a heartbeat for this long belongs to a dead worker
+JOB_STALE_SECONDS = 180
+MAX_JOB_ATTEMPTS = 3
+JOB_ABANDONED_ERROR = "Job abandoned after repeated worker failures"
+SSE_POLL_INTERVAL = 1
+# comment frames keep proxies from closing a quiet stream
+SSE_KEEPALIVE_SECONDS = 15
+LIVE_STAGE_SUFFIX = "_delta"
+
+jobs_collection = db["evaluation_jobs"]
+events_collection = db["events"]
+teams_collection = db["teams"]
+
+router = APIRouter(tags=["evaluation-jobs"])
+
+Handler = Callable[[Dict[str, Any], Callable[[str, Dict[str, Any]], Awaitable[None]]], Awaitable[Any]]
+FailureHandler = Callable[[Dict[str, Any], str], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+_failure_handlers: Dict[str, FailureHandler] = {}
+_wakeup: Optional[asyncio.Event] = None
+_workers = []
+# in-process feed for SSE streams, one queue per open stream: None when a
+# stage was stored, (stage, data) for live text; streams in other
+# processes fall back to polling
+_job_updates: Dict[str, Set[asyncio.Queue]] = {}
+
+
+def register_handler(kind: str, handler: Handler, on_failure: Optional[FailureHandler] = None):
+    _handlers[kind] = handler
+    if on_failure:
+        _failure_handlers[kind] = on_failure
+
+
+def _event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+def _notify(job_id: str, item: Optional[Tuple[str, Dict[str, Any]]] = None):
+    for queue in _job_updates.get(job_id, ()):
+        queue.put_nowait(item)
+
+
+# ------------ QUEUE ------------
+async def enqueue_job(kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> str:
+    now = datetime.utcnow()
+    job = {
+        "kind": kind,
+        "payload": payload,
+        "status": "queued",
+        "stage": "queued",
+        "stages": [],
+        "result": None,
+        "error": None,
+        "attempts": 0,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+    if dedupe_key:
+        job["dedupeKey"] = dedupe_key
+
+    while True:
+        try:
+            res = await jobs_collection.insert_one(job)
+            break
+        except DuplicateKeyError:
+            job.pop("_id", None)
+            existing = await jobs_collection.find_one({"dedupeKey": dedupe_key}, {"_id": 1})
+            if existing:
+                return str(existing["_id"])
+            # the holder finished in between; try again
+
+    _event().set()
+    return str(res.inserted_id)
+
+
+async def claim_job() -> Optional[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return await jobs_collection.find_one_and_update(
+        {"status": "queued"},
+        {
+            "$set": {"status": "running", "startedAt": now, "heartbeatAt": now, "updatedAt": now},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("createdAt", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def requeue_stale_jobs():
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    await jobs_collection.update_many(
+        {"status": "running", "heartbeatAt": {"$lt": cutoff}, "attempts": {"$lt": MAX_JOB_ATTEMPTS}},
+        {"$set": {"status": "queued", "stage": "queued", "updatedAt": datetime.utcnow()}},
+    )
+    # one at a time, so each abandoned job is failed by exactly one worker
+    while True:
+        job = await jobs_collection.find_one_and_update(
+            {"status": "running", "heartbeatAt": {"$lt": cutoff}, "attempts": {"$gte": MAX_JOB_ATTEMPTS}},
+            _failed_update(JOB_ABANDONED_ERROR),
+        )
+        if not job:
+            break
+        await _on_failure(job, JOB_ABANDONED_ERROR)
+
+
+def _failed_update(error: str) -> Dict[str, Any]:
+    return {
+        "$set": {"status": "error", "stage": "error", "error": error, "finishedAt": datetime.utcnow()},
+        "$unset": {"dedupeKey": ""},
+    }
+
+
+async def _on_failure(job: Dict[str, Any], error: str):
+    on_failure = _failure_handlers.get(job["kind"])
+    if not on_failure:
+        return
+    try:
+        await on_failure(job, error)
+    except Exception as e:
+        print("Job failure handler error:", job["_id"], e)
+
+
+# ------------ WORKERS ------------
+async def _heartbeat(job_id: ObjectId):
+    # a failed write is retried on the next beat; JOB_STALE_SECONDS leaves
+    # room for several misses before the job is taken over
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            await jobs_collection.update_one(
+                {"_id": job_id}, {"$set": {"heartbeatAt": datetime.utcnow()}}
+            )
+        except Exception as e:
+            print("Job heartbeat error:", job_id, e)
+
+
+async def run_job(job: Dict[str, Any]):
+    job_id = job["_id"]
+    # continue numbering after events of an earlier, interrupted attempt
+    seq = len(job.get("stages") or [])
+
+    async def report(stage: str, data: Dict[str, Any] = None):
+        nonlocal seq
+        if stage.endswith(LIVE_STAGE_SUFFIX):
+            _notify(str(job_id), (stage, data or {}))
+            return
+        seq += 1
+        now = datetime.utcnow()
+        await jobs_collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {"stage": stage, "heartbeatAt": now, "updatedAt": now},
+                "$push": {"stages": {"seq": seq, "stage": stage, "data": data or {}, "at": now}},
+            },
+        )
+        _notify(str(job_id))
+
+    heartbeat = asyncio.create_task(_heartbeat(job_id))
+    try:
+        handler = _handlers.get(job["kind"])
+        if not handler:
+            raise RuntimeError(f"No handler for job kind '{job['kind']}'")
+
+        result = await handler(job, report)
+        # the stage goes first: a stream that sees the terminal status has
+        # already been given every stage
+        await report("completed")
+        await jobs_collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {"status": "completed", "result": result, "finishedAt": datetime.utcnow()},
+                "$unset": {"dedupeKey": ""},
+            },
+        )
+    except Exception as e:
+        await jobs_collection.update_one({"_id": job_id}, _failed_update(str(e)))
+        await _on_failure(job, str(e))
+    finally:
+        heartbeat.cancel()
+        _notify(str(job_id))
+
+
+async def worker_loop():
+    wakeup = _event()
+    while True:
+        # clear before claiming so an enqueue in between is not missed
+        wakeup.clear()
+        job = await claim_job()
+        if job:
+            await run_job(job)
+            continue
+
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            await requeue_stale_jobs()
+
+
+@router.on_event("startup")
+async def start_job_workers():
+    # only unfinished jobs carry a dedupe key
+    await jobs_collection.create_index("dedupeKey", unique=True, sparse=True)
+    await requeue_stale_jobs()
+    for _ in range(EVALUATION_WORKERS):
+        _workers.append(asyncio.create_task(worker_loop()))
+
+
+# ------------ ACCESS ------------
+async def _can_read(payload: Dict[str, Any], user: Dict[str, Any]) -> bool:
+    # the user who asked for it, a member of the submitting team, or the
+    # organizer of the event
+    if payload.get("userId") == user["id"]:
+        return True
+    event_id = payload.get("eventId")
+    if not event_id:
+        return False
+    team_id = payload.get("teamId")
+    if team_id and await teams_collection.find_one(
+        {"_id": ObjectId(team_id), "members.userId": user["id"]}, {"_id": 1}
+    ):
+        return True
+    return bool(await events_collection.find_one(
+        {"_id": ObjectId(event_id), "organizerId": ObjectId(user["id"])}, {"_id": 1}
+    ))
+
+
+async def readable_job_id(job_id: str, user=Depends(get_current_user)) -> ObjectId:
+    try:
+        obj_id = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(400, "Invalid job id")
+
+    job = await jobs_collection.find_one({"_id": obj_id}, {"payload": 1})
+    # someone else's job is reported as missing, not as forbidden
+    if not job or not await _can_read(job.get("payload") or {}, user):
+        raise HTTPException(404, "Job not found")
+    return obj_id
+
+
+# ------------ STATUS ------------
+@router.get("/jobs/{job_id}")
+async def job_status(obj_id: ObjectId = Depends(readable_job_id)):
+    job = await jobs_collection.find_one({"_id": obj_id}, {"payload": 0})
+    if not job:
+        raise HTTPException(404, "Job not found")
+
+    return {"success": True, "data": serialize_doc(job)}
+
+
+# ------------ SSE PROGRESS ------------
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _job_progress(job_id: ObjectId, last_seq: int) -> Optional[Dict[str, Any]]:
+    # status plus only the stages the stream has not sent; the result is
+    # read once, when the job is done
+    jobs = await jobs_collection.aggregate([
+        {"$match": {"_id": job_id}},
+        {"$project": {
+            "status": 1,
+            "error": 1,
+            "stages": {"$filter": {"input": "$stages", "cond": {"$gt": ["$$this.seq", last_seq]}}},
+        }},
+    ]).to_list(1)
+    return jobs[0] if jobs else None
+
+
+async def job_event_stream(job_id: ObjectId, last_seq: int):
+    key = str(job_id)
+    updates: asyncio.Queue = asyncio.Queue()
+    _job_updates.setdefault(key, set()).add(updates)
+    loop = asyncio.get_event_loop()
+    last_sent = loop.time()
+
+    try:
+        while True:
+            job = await _job_progress(job_id, last_seq)
+            if not job:
+                yield _sse("error", {"error": "Job not found"})
+                return
+
+            for ev in job.get("stages") or []:
+                last_seq = ev["seq"]
+                last_sent = loop.time()
+                yield _sse(ev["stage"], ev.get("data") or {}, last_seq)
+
+            if job["status"] in ("completed", "error"):
+                done = await jobs_collection.find_one({"_id": job_id}, {"result": 1})
+                yield _sse("done", {
+                    "status": job["status"],
+                    "error": job.get("error"),
+                    "result": (done or {}).get("result"),
+                })
+                return
+
+            if loop.time() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                last_sent = loop.time()
+                yield ": keepalive\n\n"
+
+            # live text until the next stored stage or the poll interval;
+            # it has no id, so a reconnect resumes from the stored stages
+            deadline = loop.time() + SSE_POLL_INTERVAL
+            while True:
+                try:
+                    item = await asyncio.wait_for(updates.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    break
+                last_sent = loop.time()
+                yield _sse(*item)
+    finally:
+        subscribers = _job_updates.get(key)
+        if subscribers is not None:
+            subscribers.discard(updates)
+            if not subscribers:
+                del _job_updates[key]
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(request: Request, obj_id: ObjectId = Depends(readable_job_id)):
+    """
+    Server-Sent Events for one job: a frame per finished stage (cloned,
+    static_analysis, chunk_rated k/N, llm_rating, mentor, rewrite, report)
+    carrying its partial results, then a final `done`. mentor_delta /
+    rewrite_delta frames carry the markdown as it is written. Reconnects
+    resume after the Last-Event-ID header.
+    """
+    try:
+        last_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_seq = 0
+
+    return StreamingResponse(
+        job_event_stream(obj_id, last_seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,58 @@
+import random
+import hashlib
+from typing import Any, Dict, List
+
+# MinHash signatures over the duplication fingerprints of graph.duplication,
+# per file and for the whole repo, and their LSH band keys. Pure functions:
+# they run in the tool process pool next to the fingerprinting, and
+# graph.similarity_index stores and compares the results.
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS   # ~50% Jaccard is where the LSH curve turns over
+PRIME = (1 << 61) - 1
+MIN_FILE_FINGERPRINTS = 5   # tiny files match everything
+
+_rng = random.Random(0x5EED)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(NUM_PERM)]
+
+
+# ------------ SIGNATURES ------------
+def minhash(hashes) -> List[int]:
+    values = set(hashes)
+    return [min((a * h + b) % PRIME for h in values) for a, b in PERMUTATIONS]
+
+
+def combine(signatures: List[List[int]]) -> List[int]:
+    # MinHash of a union is the element-wise minimum
+    return [min(col) for col in zip(*signatures)]
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def band_keys(signature: List[int]) -> List[str]:
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.sha1(",".join(map(str, rows)).encode()).hexdigest()[:16]
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def repo_signatures(fingerprints: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Per-file and whole-repo MinHash signatures from the per-file fingerprints
+    of graph.duplication.
+    """
+    files = {}
+    for path, data in fingerprints.items():
+        hashes = [h for h, _, _ in data["fingerprints"]]
+        if len(hashes) >= MIN_FILE_FINGERPRINTS:
+            files[path] = minhash(hashes)
+
+    return {
+        "repo": combine(list(files.values())) if files else None,
+        "files": files,
+    }
@@ -1,18 +1,22 @@
 import os
-import io
 import json
-import base64
+import hashlib
 import tempfile
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi import status
-from pptx import Presentation
 import httpx
 from dotenv import load_dotenv
-from openai import AsyncOpenAI
+from graph.executors import io_pool, tool_pool
+from graph.slide_extract import extract_slides
+from graph.slide_images import image_stats, record_image_stats
+from utils.llm_gateway import chat
+from utils.llm_scheduler import BULK, llm_context
+from utils.single_flight import normalize_text, payload_key, single_flight
+from utils.markdown_stream import Emit, markdown_stream
 from typing import TypedDict,Optional
 import os 
 
@@ -36,64 +40,101 @@ OPENAI_API_KEY= OPEN_AI_KEY
 if not OPENAI_API_KEY:
     raise RuntimeError("OPEN_AI_KEY is not set")
 
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-
 router = APIRouter( tags=["ppt"])
 
 GPT_MODEL = "gpt-4o-mini"
 HTTP_TIMEOUT = 30
 MAX_CONCURRENT_SLIDES = 4
+# decks are streamed to a spooled file: memory up to PPT_SPOOL_MB, disk past it
+PPT_MAX_BYTES = int(os.getenv("PPT_MAX_MB", "100")) * 1024 * 1024
+PPT_SPOOL_BYTES = int(os.getenv("PPT_SPOOL_MB", "8")) * 1024 * 1024
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
 
+_http_client: Optional[httpx.AsyncClient] = None
 
-def img_to_b64(blob: bytes) -> str:
-    return "data:image/png;base64," + base64.b64encode(blob).decode("utf-8")
 
+def _http() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=HTTP_TIMEOUT)
+    return _http_client
 
-async def load_presentation(source: str) -> Presentation:
-    if source.startswith("http://") or source.startswith("https://"):
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as c:
-            r = await c.get(source)
+
+@router.on_event("shutdown")
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"PPT is larger than {PPT_MAX_BYTES // (1024 * 1024)} MB",
+    )
+
+
+async def download_presentation(url: str) -> IO[bytes]:
+    """The deck at `url` in a spooled temporary file, rewound; over PPT_MAX_BYTES is a 413."""
+    spool = tempfile.SpooledTemporaryFile(max_size=PPT_SPOOL_BYTES)
+    try:
+        async with _http().stream("GET", url) as r:
             if r.status_code != 200:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Failed to fetch PPT from URL, status {r.status_code}",
                 )
-            return Presentation(io.BytesIO(r.content))
-    return Presentation(source)
+            # refuse before reading a byte when the server announces the size
+            length = r.headers.get("content-length", "")
+            if length.isdigit() and int(length) > PPT_MAX_BYTES:
+                raise _too_large()
+
+            size = 0
+            async for chunk in r.aiter_bytes(DOWNLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > PPT_MAX_BYTES:
+                    raise _too_large()
+                spool.write(chunk)
+        spool.seek(0)
+        return spool
+    except httpx.HTTPError as e:
+        spool.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to fetch PPT from URL: {e}",
+        )
+    except BaseException:
+        spool.close()
+        raise
+
+
+async def read_presentation(source: str) -> Union[str, bytes]:
+    """A local path as it is; a URL downloaded into bytes for the worker."""
+    if source.startswith("http://") or source.startswith("https://"):
+        spool = await download_presentation(source)
+        try:
+            # past PPT_SPOOL_BYTES the spool is on disk
+            return await io_pool.run(spool.read)
+        finally:
+            spool.close()
+    return source
 
 
 async def extract_ppt_slides(source: str) -> List[Dict[str, Any]]:
-    prs = await load_presentation(source)
-    slides: List[Dict[str, Any]] = []
-    for idx, s in enumerate(prs.slides):
-        texts: List[str] = []
-        images: List[str] = []
-        for sh in s.shapes:
-            if hasattr(sh, "text") and isinstance(sh.text, str):
-                t = sh.text.strip()
-                if t:
-                    texts.append(t)
-            if getattr(sh, "shape_type", None) == 13 and hasattr(sh, "image"):
-                try:
-                    images.append(img_to_b64(sh.image.blob))
-                except Exception:
-                    continue
-        slides.append(
-            {
-                "index": idx + 1,
-                "text": "\n".join(texts),
-                "images": images,
-            }
-        )
-    return slides
+    deck = await read_presentation(source)
+    # parsing and image decoding/resizing are CPU-bound: a worker process
+    extracted = await tool_pool.run(extract_slides, deck)
+    record_image_stats(extracted["image_stats"])
+    return extracted["slides"]
 
 
 async def call_gpt_json(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
     try:
-        res = await client.chat.completions.create(
+        content = await chat(
+            messages,
             model=GPT_MODEL,
-            messages=messages,
-            response_format={"type": "json_object"},
+            json_mode=True,
             temperature=0,
             timeout=HTTP_TIMEOUT,
         )
@@ -102,7 +143,6 @@ async def call_gpt_json(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"LLM call failed: {str(e)}",
         )
-    content = res.choices[0].message.content
     try:
         return json.loads(content)
     except Exception:
@@ -259,7 +299,13 @@ async def deck_level_analysis(topic: str, slides_data: List[Dict[str, Any]]) ->
     return await call_gpt_json(messages)
 
 
-async def analyze_ppt_with_gpt(state: State) -> State:
+async def analyze_ppt_with_gpt(state: State, on_mentor: Optional[Emit] = None) -> State:
+    # slide grading is background work for the LLM scheduler
+    with llm_context(priority=BULK):
+        return await _analyze_ppt(state, on_mentor)
+
+
+async def _analyze_ppt(state: State, on_mentor: Optional[Emit] = None) -> State:
     topic = state["content"]
     file_path = state["file_path"]
 
@@ -301,7 +347,11 @@ async def analyze_ppt_with_gpt(state: State) -> State:
     await asyncio.gather(*(process_slide(slide) for slide in slides))
 
     slide_results_sorted = sorted(slide_results, key=lambda x: x["slide_number"])
-    mentor_summary = await generate_human_readable_mentorship(topic, slide_results_sorted)
+    # the mentor write-up and the deck-level pass only need the slide results
+    mentor_summary, deck_summary = await asyncio.gather(
+        generate_human_readable_mentorship(topic, slide_results_sorted, on_mentor),
+        deck_level_analysis(topic, slides),
+    )
     valid_scores = [s for s in slide_results_sorted if s["score"] is not None]
     if valid_scores:
         clarity_avg = sum(s["score_breakdown"]["clarity"] for s in valid_scores) / len(
@@ -316,8 +366,6 @@ async def analyze_ppt_with_gpt(state: State) -> State:
     else:
         clarity_avg = design_avg = story_avg = 0.0
 
-    deck_summary = await deck_level_analysis(topic, slides)
-
     missing_critical = deck_summary.get("missing_critical_sections") or []
     completeness_score = max(0.0, 100.0 - len(missing_critical) * 10.0)
 
@@ -351,7 +399,9 @@ async def analyze_ppt_with_gpt(state: State) -> State:
         "output": output,
     }
 
-async def generate_human_readable_mentorship(topic: str, slides: List[Dict[str, Any]]) -> str:
+async def generate_human_readable_mentorship(
+    topic: str, slides: List[Dict[str, Any]], on_delta: Optional[Emit] = None
+) -> str:
     slides_text = ""
     for s in slides:
         slides_text += f"Slide {s['slide_number']}:\n{s['analysis']}\n\n"
@@ -380,34 +430,61 @@ async def generate_human_readable_mentorship(topic: str, slides: List[Dict[str,
 
     user_prompt = f"Topic: {topic}\n\nSlide Analysis:\n{slides_text}"
 
-    res = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
+    return await chat(
+        [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ],
-        temperature=0
+        model="gpt-4o-mini",
+        temperature=0,
+        on_delta=on_delta,
     )
 
-    return res.choices[0].message.content
-
 
 
-@router.post("/analyze")
-async def analyze_ppt_endpoint(
-    topic: str = Form(...),
-    file: Optional[UploadFile] = File(None),
-    file_url: Optional[str] = Form(None),
-): 
-    print("Received analyze request with topic:", topic)
+async def _save_upload(file: UploadFile, ext: str) -> Tuple[str, str]:
+    """Copies the upload to a temporary file in chunks; returns (path, sha256)."""
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+        try:
+            while True:
+                chunk = await file.read(DOWNLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > PPT_MAX_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            _remove(tmp.name)
+            raise
+    return tmp.name, digest.hexdigest()
+
+
+def _remove(path: Optional[str]):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception:
+            pass
+
+
+async def _read_source(
+    topic: str, file: Optional[UploadFile], file_url: Optional[str]
+) -> Tuple[Optional[str], str]:
+    """
+    Validated source: the path of the saved upload (None for a URL, which is
+    fetched during analysis), plus the coalescing key.
+    """
     if not file and not file_url:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Either file or file_url is required",
         )
 
-    temp_path: Optional[str] = None
-
     if file:
         filename = file.filename or ""
         ext = os.path.splitext(filename)[1].lower()
@@ -416,11 +493,10 @@ async def analyze_ppt_endpoint(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Only .ppt or .pptx files are supported",
             )
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            temp_path = tmp.name
-        file_path = temp_path
+        if (getattr(file, "size", None) or 0) > PPT_MAX_BYTES:
+            raise _too_large()
+        temp_path, digest = await _save_upload(file, ext)
+        source = {"sha256": digest}
     else:
         parsed = urlparse(file_url)
         if parsed.scheme not in ("http", "https"):
@@ -428,24 +504,73 @@ async def analyze_ppt_endpoint(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="file_url must be http or https",
             )
-        file_path = file_url
+        temp_path = None
+        source = {"url": file_url.strip()}
+
+    return temp_path, payload_key("ppt-analyze", {"topic": normalize_text(topic), **source})
+
+
+@router.post("/analyze")
+async def analyze_ppt_endpoint(
+    topic: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    file_url: Optional[str] = Form(None),
+): 
+    print("Received analyze request with topic:", topic)
+    temp_path, key = await _read_source(topic, file, file_url)
+
+    # the same deck for the same topic, already being analyzed: wait for that run.
+    # The run that starts owns its upload; a caller that joins drops its copy.
+    started = False
+
+    def start():
+        nonlocal started
+        started = True
+        return _analyze_source(topic, temp_path, file_url)
+
+    try:
+        result_state = await single_flight(key, start)
+    finally:
+        if not started:
+            _remove(temp_path)
+    return result_state["output"]
 
+
+@router.post("/analyze/stream")
+async def analyze_ppt_stream(
+    topic: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    file_url: Optional[str] = Form(None),
+):
+    """
+    /analyze as server-sent events: the mentor write-up arrives as `delta`
+    events while it is written, then `done` carries the full output.
+    """
+    temp_path, _ = await _read_source(topic, file, file_url)
+
+    async def produce(emit: Emit) -> Dict[str, Any]:
+        result_state = await _analyze_source(topic, temp_path, file_url, emit)
+        return result_state["output"]
+
+    return markdown_stream(produce)
+
+
+async def _analyze_source(
+    topic: str,
+    temp_path: Optional[str],
+    file_url: Optional[str],
+    on_mentor: Optional[Emit] = None,
+) -> State:
     state: State = {
         "content": topic,
-        "file_path": file_path,
+        "file_path": temp_path or file_url,
     }
 
     try:
-        result_state = await analyze_ppt_with_gpt(state)
+        return await analyze_ppt_with_gpt(state, on_mentor)
     finally:
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except Exception:
-                pass
-
-    return result_state["output"]
+        _remove(temp_path)
 
 @router.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "images": image_stats()}
@@ -0,0 +1,125 @@
+import os
+import hashlib
+from typing import Any, Dict, List
+
+# Extension -> language for files worth reading. Only these get LOC and a
+# content hash; everything else is recorded with its size alone.
+LANGUAGES = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".html": "html",
+    ".css": "css",
+    ".cpp": "cpp",
+    ".c": "c",
+    ".h": "c",
+    ".java": "java",
+    ".go": "go",
+    ".rs": "rust",
+}
+
+# larger files are almost always generated or vendored
+MAX_INDEXED_BYTES = int(os.getenv("MAX_INDEXED_BYTES", str(2 * 1024 * 1024)))
+
+SKIP_DIRS = {".git"}
+
+
+def _markers(rel_dir: str, name: str, markers: Dict[str, bool]):
+    lower = name.lower()
+    if lower.startswith("readme"):
+        markers["has_readme"] = True
+    if lower in ("requirements.txt", "pyproject.toml", "setup.py"):
+        markers["has_requirements"] = True
+    if lower == "dockerfile":
+        markers["has_dockerfile"] = True
+    if "tests" in rel_dir.lower():
+        markers["has_tests"] = True
+    if ".github/workflows" in rel_dir:
+        markers["has_github_actions"] = True
+
+
+def _read_stats(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    loc = data.count(b"\n")
+    if data and not data.endswith(b"\n"):
+        loc += 1
+    return loc, hashlib.sha1(data).hexdigest()
+
+
+def build_manifest(repo: str) -> Dict[str, Any]:
+    """
+    Walks the checkout once with os.scandir and records everything the
+    evaluator stages need: files (relative path, size, language, LOC, sha1),
+    directory/file counts and the structure markers.
+    """
+    files: List[Dict[str, Any]] = []
+    markers = {
+        "has_readme": False,
+        "has_requirements": False,
+        "has_tests": False,
+        "has_dockerfile": False,
+        "has_github_actions": False,
+    }
+    dir_count = 0
+
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            it = os.scandir(os.path.join(repo, rel_dir))
+        except OSError:
+            continue
+
+        with it:
+            for entry in it:
+                if entry.name in SKIP_DIRS:
+                    continue
+                rel = entry.name if not rel_dir else f"{rel_dir}/{entry.name}"
+
+                if entry.is_dir(follow_symlinks=False):
+                    dir_count += 1
+                    stack.append(rel)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+
+                size = entry.stat(follow_symlinks=False).st_size
+                language = LANGUAGES.get(os.path.splitext(entry.name)[1].lower())
+                loc, digest = None, None
+                if language and size <= MAX_INDEXED_BYTES:
+                    try:
+                        loc, digest = _read_stats(entry.path)
+                    except OSError:
+                        pass
+
+                files.append({
+                    "path": rel,
+                    "size": size,
+                    "language": language,
+                    "loc": loc,
+                    "hash": digest,
+                })
+                _markers(rel_dir, entry.name, markers)
+
+    files.sort(key=lambda f: f["path"])
+
+    return {
+        "root": repo,
+        "files": files,
+        "file_count": len(files),
+        "dir_count": dir_count,
+        "markers": markers,
+    }
+
+
+def analyze_structure(repo: str, manifest: Dict[str, Any] = None) -> Dict[str, Any]:
+    # analysis tool entry point (tool_pool)
+    manifest = manifest or build_manifest(repo)
+    return {
+        **manifest["markers"],
+        "file_count": manifest["file_count"],
+        "dir_count": manifest["dir_count"],
+    }
@@ -0,0 +1,136 @@
+from datetime import datetime
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING
+
+from config.db import db
+from graph.minhash import band_keys, estimate_similarity
+
+# Cross-team similarity per event. Every repo gets MinHash signatures over its
+# duplication fingerprints (per file and for the whole repo, see
+# graph.minhash). Signatures are
+# cut into LSH bands and each band is stored as a bucket key, so a new
+# submission only looks at the submissions that share a bucket with it
+# instead of comparing against every team in the event.
+
+MAX_MATCHES = 20
+
+repo_signatures_collection = db["repo_signatures"]
+similarity_buckets_collection = db["similarity_buckets"]
+_indexes_ready = False
+
+
+# ------------ STORE ------------
+async def _ensure_indexes():
+    # buckets are matched by (event, band key) and replaced per submission;
+    # repo_signatures is only read by _id (the commit sha)
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    await similarity_buckets_collection.create_index([("eventId", ASCENDING), ("key", ASCENDING)])
+    await similarity_buckets_collection.create_index([("eventId", ASCENDING), ("submissionId", ASCENDING)])
+    _indexes_ready = True
+
+
+async def save_signatures(commit_sha: str, signatures: Dict[str, Any]):
+    # keyed by commit: two teams submitting the same code share one entry
+    await repo_signatures_collection.replace_one(
+        {"_id": commit_sha},
+        {
+            "_id": commit_sha,
+            "repo": signatures.get("repo"),
+            # Mongo keys cannot contain dots, so files are stored as a list
+            "files": [{"path": p, "sig": s} for p, s in signatures.get("files", {}).items()],
+            "createdAt": datetime.utcnow(),
+        },
+        upsert=True,
+    )
+
+
+async def index_submission(event_id: str, submission_id: str, team_id: str, commit_sha: str) -> bool:
+    record = await repo_signatures_collection.find_one({"_id": commit_sha})
+    if not record or not record.get("repo"):
+        return False
+
+    await _ensure_indexes()
+    await similarity_buckets_collection.delete_many(
+        {"eventId": event_id, "submissionId": submission_id}
+    )
+
+    base = {"eventId": event_id, "submissionId": submission_id, "teamId": team_id, "commitSha": commit_sha}
+    docs = [{**base, "key": k, "path": None} for k in band_keys(record["repo"])]
+    for f in record.get("files", []):
+        docs.extend({**base, "key": k, "path": f["path"]} for k in band_keys(f["sig"]))
+
+    await similarity_buckets_collection.insert_many(docs)
+    return True
+
+
+async def find_similar(event_id: str, submission_id: str) -> Dict[str, Any]:
+    """
+    Most similar other submissions of the event and their matching file
+    pairs, both estimated from signatures of LSH candidates only.
+    """
+    own = await similarity_buckets_collection.find(
+        {"eventId": event_id, "submissionId": submission_id}
+    ).to_list(None)
+    if not own:
+        return {"submissions": [], "file_pairs": []}
+
+    commit_sha = own[0]["commitSha"]
+    own_keys = defaultdict(list)
+    for b in own:
+        own_keys[b["key"]].append(b["path"])
+
+    candidates = await similarity_buckets_collection.find({
+        "eventId": event_id,
+        "key": {"$in": list(own_keys.keys())},
+        "submissionId": {"$ne": submission_id},
+    }).to_list(None)
+
+    repo_candidates = {}
+    file_candidates = set()
+    for c in candidates:
+        for own_path in own_keys[c["key"]]:
+            if own_path is None and c["path"] is None:
+                repo_candidates[c["submissionId"]] = (c["teamId"], c["commitSha"])
+            elif own_path is not None and c["path"] is not None:
+                file_candidates.add((own_path, c["submissionId"], c["teamId"], c["commitSha"], c["path"]))
+
+    shas = {commit_sha} | {sha for _, sha in repo_candidates.values()} | {c[3] for c in file_candidates}
+    records = await repo_signatures_collection.find({"_id": {"$in": list(shas)}}).to_list(None)
+    sigs = {
+        r["_id"]: {"repo": r.get("repo"), "files": {f["path"]: f["sig"] for f in r.get("files", [])}}
+        for r in records
+    }
+    mine = sigs.get(commit_sha)
+    if not mine:
+        return {"submissions": [], "file_pairs": []}
+
+    submissions = []
+    for other_id, (team_id, sha) in repo_candidates.items():
+        other = sigs.get(sha)
+        if other and other["repo"]:
+            submissions.append({
+                "submissionId": other_id,
+                "teamId": team_id,
+                "similarity": round(estimate_similarity(mine["repo"], other["repo"]), 3),
+            })
+
+    file_pairs = []
+    for own_path, other_id, team_id, sha, other_path in file_candidates:
+        a = mine["files"].get(own_path)
+        b = (sigs.get(sha) or {}).get("files", {}).get(other_path)
+        if a and b:
+            file_pairs.append({
+                "file": own_path,
+                "submissionId": other_id,
+                "teamId": team_id,
+                "otherFile": other_path,
+                "similarity": round(estimate_similarity(a, b), 3),
+            })
+
+    submissions.sort(key=lambda x: x["similarity"], reverse=True)
+    file_pairs.sort(key=lambda x: x["similarity"], reverse=True)
+    return {"submissions": submissions[:MAX_MATCHES], "file_pairs": file_pairs[:MAX_MATCHES]}
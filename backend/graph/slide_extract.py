@@ -0,0 +1,55 @@
+import io
+from typing import Any, Dict, List, Union
+
+from pptx import Presentation
+
+from graph import slide_images
+
+# Runs inside tool_pool. Parsing a deck and decoding, resizing and hashing
+# its pictures is seconds of CPU for a large file, so it happens in a worker
+# process instead of a thread that holds the GIL against the event loop.
+# The picture cache and counters of graph.slide_images live in the worker;
+# the counters each deck added are handed back so the parent can report them.
+
+# picture shape type in python-pptx (MSO_SHAPE_TYPE.PICTURE)
+PICTURE = 13
+
+
+def slides_from_presentation(prs: Presentation) -> List[Dict[str, Any]]:
+    texts_per_slide: List[str] = []
+    blobs_per_slide: List[List[bytes]] = []
+    for s in prs.slides:
+        texts: List[str] = []
+        blobs: List[bytes] = []
+        for sh in s.shapes:
+            if hasattr(sh, "text") and isinstance(sh.text, str):
+                t = sh.text.strip()
+                if t:
+                    texts.append(t)
+            if getattr(sh, "shape_type", None) == PICTURE and hasattr(sh, "image"):
+                try:
+                    blobs.append(sh.image.blob)
+                except Exception:
+                    continue
+        texts_per_slide.append("\n".join(texts))
+        blobs_per_slide.append(blobs)
+
+    # downsized, correctly typed, and each picture only on the first slide using it
+    images_per_slide = slide_images.prepare_deck_images(blobs_per_slide)
+    return [
+        {
+            "index": idx + 1,
+            "text": text,
+            "images": images,
+        }
+        for idx, (text, images) in enumerate(zip(texts_per_slide, images_per_slide))
+    ]
+
+
+def extract_slides(source: Union[str, bytes]) -> Dict[str, Any]:
+    """Slides of the deck at a local path (or in `source` bytes) and the image counters it added."""
+    before = dict(slide_images.stats)
+    prs = Presentation(io.BytesIO(source) if isinstance(source, bytes) else source)
+    slides = slides_from_presentation(prs)
+    added = {k: v - before.get(k, 0) for k, v in slide_images.stats.items()}
+    return {"slides": slides, "image_stats": added}
@@ -0,0 +1,165 @@
+import io
+import os
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+# Slide pictures are prepared before they reach the vision model:
+#   - shrunk so the longer side is at most SLIDE_IMAGE_MAX_SIDE; the model
+#     rescales anything larger to about 768 px on the short side anyway
+#   - re-encoded as JPEG (PNG when there is transparency) unless the original
+#     is already smaller, and labelled with its real type instead of a
+#     blanket image/png
+#   - deduplicated across the deck, so a logo or template graphic repeated
+#     on every slide is sent with the first slide only. Only the same picture
+#     counts: the same bytes, or a re-encoded copy with the same prepared
+#     dimensions, about the same size and a difference hash at most
+#     DHASH_DISTANCE bits away. Similar-looking charts or screenshots that
+#     differ in their content are all kept.
+# Prepared images are cached by content hash, so a logo shared by many
+# decks is decoded and resized once by each tool_pool worker
+# (graph.slide_extract).
+
+SLIDE_IMAGE_MAX_SIDE = int(os.getenv("SLIDE_IMAGE_MAX_SIDE", "1024"))
+SLIDE_IMAGE_JPEG_QUALITY = 85
+# both sides below this: bullets, dividers and icons, not content
+SLIDE_IMAGE_MIN_SIDE = 32
+# dHash bits that may differ for two images to count as the same picture
+DHASH_DISTANCE = int(os.getenv("SLIDE_IMAGE_DHASH_DISTANCE", "2"))
+# relative difference in encoded size allowed for a re-encoded copy
+DUPLICATE_SIZE_TOLERANCE = 0.05
+SLIDE_IMAGE_CACHE_SIZE = int(os.getenv("SLIDE_IMAGE_CACHE_SIZE", "512"))
+
+# data URL, dHash, prepared (width, height), encoded bytes
+Prepared = Tuple[str, int, Tuple[int, int], int]
+# formats sent as they are when no resize is needed
+ORIGINAL_MIME = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# per worker process; the web process only sums the counters in stats
+_cache: "OrderedDict[str, Optional[Prepared]]" = OrderedDict()
+_cache_lock = threading.Lock()
+stats = {"prepared": 0, "cache_hits": 0, "skipped": 0, "duplicates": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash: brightness gradients of a 9x8 grayscale thumbnail."""
+    small = img.convert("L").resize((9, 8), Image.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = px[row * 9 + col]
+            right = px[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+def _encode(img: Image.Image) -> Tuple[str, bytes]:
+    buf = io.BytesIO()
+    if _has_alpha(img):
+        img.convert("RGBA").save(buf, format="PNG", optimize=True)
+        return "image/png", buf.getvalue()
+    img.convert("RGB").save(buf, format="JPEG", quality=SLIDE_IMAGE_JPEG_QUALITY, optimize=True)
+    return "image/jpeg", buf.getvalue()
+
+
+def _prepare(blob: bytes) -> Optional[Prepared]:
+    try:
+        img = Image.open(io.BytesIO(blob))
+        # animated GIFs: the first frame is what the slide shows
+        img.seek(0)
+        img.load()
+    except Exception:
+        # EMF/WMF and other vector formats the model cannot read either
+        return None
+
+    if img.width < SLIDE_IMAGE_MIN_SIDE and img.height < SLIDE_IMAGE_MIN_SIDE:
+        return None
+
+    original = ORIGINAL_MIME.get(img.format or "")
+    if max(img.size) > SLIDE_IMAGE_MAX_SIDE:
+        img.thumbnail((SLIDE_IMAGE_MAX_SIDE, SLIDE_IMAGE_MAX_SIDE), Image.LANCZOS)
+        original = None
+
+    mime, data = _encode(img)
+    if original and len(blob) <= len(data):
+        # already small and in a format the model reads: re-encoding only adds bytes
+        mime, data = original, blob
+    stats["bytes_out"] += len(data)
+    url = f"data:{mime};base64," + base64.b64encode(data).decode("utf-8")
+    return url, dhash(img), img.size, len(data)
+
+
+def prepare_image(blob: bytes) -> Optional[Prepared]:
+    """Prepared picture for a blob, or None when it is not worth sending."""
+    key = hashlib.sha1(blob).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            stats["cache_hits"] += 1
+            return _cache[key]
+
+    stats["bytes_in"] += len(blob)
+    prepared = _prepare(blob)
+    stats["prepared" if prepared else "skipped"] += 1
+
+    with _cache_lock:
+        _cache[key] = prepared
+        while len(_cache) > SLIDE_IMAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return prepared
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _same_picture(a: Prepared, b: Prepared) -> bool:
+    _, hash_a, size_a, bytes_a = a
+    _, hash_b, size_b, bytes_b = b
+    if size_a != size_b:
+        return False
+    if abs(bytes_a - bytes_b) > DUPLICATE_SIZE_TOLERANCE * max(bytes_a, bytes_b):
+        return False
+    return _hamming(hash_a, hash_b) <= DHASH_DISTANCE
+
+
+def prepare_deck_images(deck: List[List[bytes]]) -> List[List[str]]:
+    """
+    Data URLs per slide for the picture blobs per slide. A picture that
+    already appeared earlier in the deck, byte for byte or as a re-encoded
+    copy, is left out.
+    """
+    seen: List[Prepared] = []
+    slides: List[List[str]] = []
+    for blobs in deck:
+        kept: List[str] = []
+        for blob in blobs:
+            prepared = prepare_image(blob)
+            if prepared is None:
+                continue
+            if any(_same_picture(prepared, s) for s in seen):
+                stats["duplicates"] += 1
+                continue
+            seen.append(prepared)
+            kept.append(prepared[0])
+        slides.append(kept)
+    return slides
+
+
+def record_image_stats(added: Dict[str, int]):
+    # counters a worker added while preparing one deck
+    for k, v in added.items():
+        stats[k] = stats.get(k, 0) + v
+
+
+def image_stats() -> Dict[str, Any]:
+    return dict(stats)
@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# OpenAI-compatible stand-in for OpenAI and Groq, for load tests that must
+# not spend provider quota. Point the backend at it with
+#   OPENAI_BASE_URL=http://localhost:9100/v1 GROQ_BASE_URL=http://localhost:9100/v1
+# and run
+#   uvicorn loadtest.fake_provider:app --port 9100
+# Latency is drawn per request from FAKE_LLM_LATENCY (and FAKE_TTS_LATENCY /
+# FAKE_STT_LATENCY), written as
+#   fixed:300 | uniform:200:1500 | normal:800:200 | lognormal:800:0.6
+# in milliseconds (lognormal takes the median and sigma). A share of requests
+# fails with 429 or 5xx, like the real providers under load. Answers are
+# canned: the first rule whose `match` occurs in the prompt wins, so the
+# backend's parsers get the shapes they expect. FAKE_LLM_RESPONSES points to
+# a JSON list of {"match": "...", "response": "..." | {...}} rules that go in
+# front of the built-in ones.
+
+LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:800:0.5")
+TTS_LATENCY = os.getenv("FAKE_TTS_LATENCY", "lognormal:400:0.4")
+STT_LATENCY = os.getenv("FAKE_STT_LATENCY", "lognormal:600:0.4")
+# gap between streamed chunks
+TOKEN_LATENCY_MS = float(os.getenv("FAKE_LLM_TOKEN_MS", "15"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0.01"))
+RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0.02"))
+RETRY_AFTER_SECONDS = int(os.getenv("FAKE_LLM_RETRY_AFTER", "1"))
+RESPONSES_FILE = os.getenv("FAKE_LLM_RESPONSES")
+# roughly 1 s of 128 kbit/s audio per 15 characters
+TTS_BYTES_PER_CHAR = int(os.getenv("FAKE_TTS_BYTES_PER_CHAR", "1000"))
+STT_TEXT = os.getenv(
+    "FAKE_STT_TEXT",
+    "I built the backend with FastAPI and MongoDB, and the evaluation runs in background workers.",
+)
+
+app = FastAPI(title="fake-llm-provider")
+
+stats: Dict[str, Dict[str, int]] = {}
+
+
+# ------------ CANNED ANSWERS ------------
+def _rating(chunk: Optional[int] = None) -> Dict[str, Any]:
+    rating = {
+        "logic": random.randint(55, 95),
+        "relevance": random.randint(55, 95),
+        "style": random.randint(55, 95),
+        "feedback": "Readable code; error handling could be more explicit.",
+    }
+    if chunk is not None:
+        rating["chunk"] = chunk
+    return rating
+
+
+def _ratings(prompt: str) -> Dict[str, Any]:
+    m = re.search(r"Return exactly (\d+) ratings", prompt)
+    return {"ratings": [_rating(i + 1) for i in range(int(m.group(1)) if m else 1)]}
+
+
+SLIDE_ANALYSIS = {
+    "clarity": {
+        "headline_present": True,
+        "key_message_present": True,
+        "text_density": "medium",
+        "readability_score": 72,
+    },
+    "design": {
+        "alignment_good": True,
+        "contrast_good": True,
+        "visual_hierarchy": "strong",
+        "consistency_issues": [],
+    },
+    "storytelling": {
+        "problem_defined": True,
+        "solution_defined": True,
+        "use_case_clear": False,
+        "logical_flow": "yes",
+    },
+    "missing_elements": ["market_analysis"],
+    "issues_detected": ["Dense bullet list"],
+    "manipulation_detected": False,
+    "suggestions": ["Split the bullet list across two slides"],
+}
+
+DECK_ANALYSIS = {
+    "missing_critical_sections": ["business_model"],
+    "strengths": ["Clear problem statement"],
+    "weaknesses": ["No competitor comparison"],
+    "narrative_flow": "moderate",
+    "story_completeness": "weak",
+    "recommended_fixes": ["Add a roadmap slide"],
+}
+
+MARKDOWN = (
+    "## Overall Performance Summary\n"
+    "The submission is solid and mostly complete.\n\n"
+    "## Strengths\n- Clear structure\n- Working core flow\n\n"
+    "## Weaknesses\n- Thin tests\n- Little error handling\n\n"
+    "## Final Recommendation\nGood progress; harden the edges before the final round.\n"
+)
+
+BUILTIN_RULES: List[Dict[str, Any]] = [
+    {"match": "Return exactly", "response": _ratings},
+    {"match": "Rate this code strictly", "response": lambda prompt: _rating()},
+    {"match": "pitch-deck evaluator", "response": SLIDE_ANALYSIS},
+    {"match": "FULL PPT DECK", "response": DECK_ANALYSIS},
+    {
+        "match": "EXACTLY 5 interview questions",
+        "response": "1. Give your introduction.\n"
+                    "2. What problem does your project solve?\n"
+                    "3. How is your backend structured?\n"
+                    "4. How do you store and query your data?\n"
+                    "5. What would you improve with more time?",
+    },
+    {"match": "Score: <0-10>", "response": "Score: 7\nFeedback: Good answer, add one concrete example next time."},
+    {"match": "summary for this event", "response": "A weekend hackathon for builders shipping AI tools for public services."},
+    {"match": "COMPLETE event configuration", "response": {
+        "name": "Jan Sahayak Build Sprint",
+        "summary": "A weekend hackathon for civic AI tools.",
+        "description": "Teams build and demo working prototypes. " * 20,
+        "date": "2026-12-12",
+        "registrationDeadline": "2026-12-01",
+        "prize": "50000",
+        "maxTeams": 100,
+        "minMembers": 2,
+        "maxMembers": 4,
+    }},
+]
+
+
+def _load_rules() -> List[Dict[str, Any]]:
+    rules = list(BUILTIN_RULES)
+    if RESPONSES_FILE:
+        with open(RESPONSES_FILE, "r", encoding="utf-8") as f:
+            rules = json.load(f) + rules
+    return rules
+
+
+RULES = _load_rules()
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for m in messages:
+        content = m.get("content")
+        if isinstance(content, list):
+            parts.extend(p.get("text", "") for p in content if p.get("type") == "text")
+        else:
+            parts.append(content or "")
+    return "\n".join(parts)
+
+
+def answer_for(messages: List[Dict[str, Any]], json_mode: bool) -> str:
+    prompt = _prompt_text(messages)
+    for rule in RULES:
+        if rule["match"] in prompt:
+            response = rule["response"]
+            if callable(response):
+                response = response(prompt)
+            return response if isinstance(response, str) else json.dumps(response)
+    return json.dumps({"result": "ok"}) if json_mode else MARKDOWN
+
+
+# ------------ FAULTS AND LATENCY ------------
+def sample_latency(spec: str) -> float:
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        ms = values[0]
+    elif kind == "uniform":
+        ms = random.uniform(values[0], values[1])
+    elif kind == "normal":
+        ms = random.gauss(values[0], values[1])
+    elif kind == "lognormal":
+        ms = random.lognormvariate(0, values[1]) * values[0]
+    else:
+        raise ValueError(f"unknown latency distribution '{spec}'")
+    return max(0.0, ms) / 1000
+
+
+def _count(route: str, outcome: str):
+    stats.setdefault(route, {}).setdefault(outcome, 0)
+    stats[route][outcome] += 1
+
+
+async def fault_or_delay(route: str, latency: str) -> Optional[Response]:
+    await asyncio.sleep(sample_latency(latency))
+    roll = random.random()
+    if roll < RATE_LIMIT_RATE:
+        _count(route, "429")
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": str(RETRY_AFTER_SECONDS)},
+        )
+    if roll < RATE_LIMIT_RATE + ERROR_RATE:
+        code = random.choice([500, 502, 503])
+        _count(route, str(code))
+        return JSONResponse({"error": {"message": "Upstream error", "type": "server_error"}}, status_code=code)
+    _count(route, "200")
+    return None
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ------------ ROUTES ------------
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await fault_or_delay("chat", LATENCY)
+    if failure:
+        return failure
+
+    messages = body.get("messages") or []
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = answer_for(messages, json_mode)
+    model = body.get("model", "gpt-4o-mini")
+    created = int(time.time())
+    prompt_tokens = _tokens(json.dumps(messages))
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _tokens(content),
+        "total_tokens": prompt_tokens + _tokens(content),
+    }
+
+    if body.get("stream"):
+        async def chunks():
+            words = re.findall(r"\S+\s*", content)
+            for word in words:
+                delta = {"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                yield f"data: {json.dumps({'object': 'chat.completion.chunk', 'model': model, **delta})}\n\n"
+                await asyncio.sleep(TOKEN_LATENCY_MS / 1000)
+            last = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            yield f"data: {json.dumps({'object': 'chat.completion.chunk', 'model': model, **last})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return {
+        "id": f"chatcmpl-fake-{created}{random.randint(0, 9999)}",
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": usage,
+    }
+
+
+@app.post("/v1/audio/speech")
+async def audio_speech(request: Request):
+    body = await request.json()
+    failure = await fault_or_delay("speech", TTS_LATENCY)
+    if failure:
+        return failure
+    size = max(1, len(body.get("input") or "")) * TTS_BYTES_PER_CHAR
+    # an ID3 header followed by silence is enough for players and clients
+    audio = b"ID3\x03\x00\x00\x00\x00\x00\x00" + bytes(size)
+    return Response(audio, media_type="audio/mpeg")
+
+
+@app.post("/v1/audio/transcriptions")
+async def audio_transcriptions(file: UploadFile = File(...), model: str = Form("whisper-1")):
+    await file.read()
+    failure = await fault_or_delay("transcriptions", STT_LATENCY)
+    if failure:
+        return failure
+    return {"text": STT_TEXT}
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {
+        "object": "list",
+        "data": [
+            {"id": m, "object": "model"}
+            for m in ("gpt-4o-mini", "tts-1", "gpt-4o-mini-tts", "whisper-1", "llama-3.1-8b-instant", "groq-alpha-001")
+        ],
+    }
+
+
+@app.get("/stats")
+async def provider_stats():
+    return stats
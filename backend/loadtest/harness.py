@@ -0,0 +1,362 @@
+import io
+import os
+import json
+import time
+import wave
+import random
+import asyncio
+import argparse
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+# Drives a realistic traffic mix against a running backend and reports
+# p50/p95/p99 latency and throughput per route. Run it against a backend
+# whose providers point at loadtest.fake_provider (and STT_PROVIDER=openai)
+# so no quota is spent:
+#
+#   python -m loadtest.harness --base-url http://localhost:8000/api \
+#       --username loadtest --password ... --event-id <id> \
+#       --stages 10,25,50,100 --duration 60
+#
+# Each stage runs that many virtual users for --duration seconds; the stage
+# where p95 climbs while throughput stops growing is the saturation point.
+# Virtual users pick a scenario by weight (--mix), run it, think, repeat.
+# /interview/interview-data still uploads the PDF to Cloudinary, so point
+# CLOUDINARY_URL at a test account.
+
+DEFAULT_MIX = "leaderboard=35,my-team=15,my-submissions=10,open-teams=10,tts=5,ppt=8,evaluate=7,viva=10"
+DEFAULT_REPOS = "https://github.com/pallets/itsdangerous,https://github.com/psf/requests-html"
+JOB_POLL_SECONDS = 2
+JOB_WAIT_LIMIT_SECONDS = 900
+
+
+# ------------ RECORDING ------------
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.monotonic()
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.samples.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        elapsed = max(1e-9, time.monotonic() - self.started)
+        rows = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            rows[route] = {
+                "count": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+                "rps": round(len(ordered) / elapsed, 2),
+            }
+        return rows
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    # nearest rank
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, Any]]):
+    print(f"\n{title}")
+    header = f"{'route':<28}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, r in rows.items():
+        print(
+            f"{route:<28}{r['count']:>8}{r['errors']:>8}{r['p50_ms']:>10}"
+            f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}{r['rps']:>8}"
+        )
+
+
+# ------------ FIXTURES ------------
+def make_pdf() -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4)
+    lines = [
+        "Project: Jan Sahayak - civic helpdesk assistant",
+        "FastAPI backend, MongoDB storage, React frontend.",
+        "Citizens ask questions by voice; answers come from a curated knowledge base.",
+        "Evaluation runs in background workers with progress streamed over SSE.",
+    ]
+    for i, line in enumerate(lines):
+        pdf.drawString(50, 800 - 20 * i, line)
+    pdf.save()
+    return buf.getvalue()
+
+
+def make_pptx(slides: int = 6) -> bytes:
+    from pptx import Presentation
+
+    deck = Presentation()
+    for i in range(slides):
+        slide = deck.slides.add_slide(deck.slide_layouts[1])
+        slide.shapes.title.text = f"Slide {i + 1}: Problem, solution and impact"
+        slide.placeholders[1].text = "Citizens wait days for answers\nWe answer in seconds\nPiloted in two districts"
+    buf = io.BytesIO()
+    deck.save(buf)
+    return buf.getvalue()
+
+
+def make_audio(seconds: float = 3.0) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(bytes(int(16000 * seconds) * 2))
+    return buf.getvalue()
+
+
+def _read(path: Optional[str], fallback: Callable[[], bytes]) -> bytes:
+    if path:
+        with open(path, "rb") as f:
+            return f.read()
+    return fallback()
+
+
+# ------------ SCENARIOS ------------
+class Context:
+    def __init__(self, args, client: httpx.AsyncClient, recorder: Recorder, tokens: List[str]):
+        self.args = args
+        self.client = client
+        self.recorder = recorder
+        self.tokens = tokens
+        self.repos = [r.strip() for r in args.repos.split(",") if r.strip()]
+        self.pdf = _read(args.pdf, make_pdf)
+        self.pptx = _read(args.pptx, make_pptx)
+        self.audio = _read(args.audio, make_audio)
+
+    def headers(self, user: int) -> Dict[str, str]:
+        if not self.tokens:
+            return {}
+        return {"Authorization": f"Bearer {self.tokens[user % len(self.tokens)]}"}
+
+    async def call(self, route: str, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.monotonic()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(route, time.monotonic() - start, False)
+            if self.args.verbose:
+                print(route, "transport error:", e)
+            return None
+        ok = response.status_code < 400
+        self.recorder.record(route, time.monotonic() - start, ok)
+        if not ok and self.args.verbose:
+            print(route, response.status_code, response.text[:200])
+        return response
+
+
+async def scenario_leaderboard(ctx: Context, user: int):
+    await ctx.call("leaderboard", "GET", f"/team/events/{ctx.args.event_id}/leaderboard", headers=ctx.headers(user))
+
+
+async def scenario_my_team(ctx: Context, user: int):
+    await ctx.call("my-team", "GET", f"/team/events/{ctx.args.event_id}/my-team", headers=ctx.headers(user))
+
+
+async def scenario_my_submissions(ctx: Context, user: int):
+    await ctx.call(
+        "my-submissions", "GET", f"/team/events/{ctx.args.event_id}/my-submissions", headers=ctx.headers(user)
+    )
+
+
+async def scenario_open_teams(ctx: Context, user: int):
+    await ctx.call("open-teams", "GET", f"/team/events/{ctx.args.event_id}/teams/open", headers=ctx.headers(user))
+
+
+async def scenario_tts(ctx: Context, user: int):
+    await ctx.call("tts", "POST", "/interview/tts", json={"text": "Tell me about your project architecture."})
+
+
+async def scenario_ppt(ctx: Context, user: int):
+    await ctx.call(
+        "ppt/analyze",
+        "POST",
+        "/ppt/analyze",
+        data={"topic": f"Civic helpdesk assistant #{random.randint(1, ctx.args.distinct_payloads)}"},
+        files={"file": ("deck.pptx", ctx.pptx, "application/vnd.openxmlformats-officedocument.presentationml.presentation")},
+    )
+
+
+async def scenario_evaluate(ctx: Context, user: int):
+    start = time.monotonic()
+    response = await ctx.call(
+        "evaluate",
+        "POST",
+        "/evaluate",
+        json={
+            "github_url": random.choice(ctx.repos),
+            "project_desc": f"Load test run #{random.randint(1, ctx.args.distinct_payloads)}",
+        },
+        headers=ctx.headers(user),
+    )
+    if not ctx.args.wait_jobs or response is None or response.status_code >= 400:
+        return
+
+    # end-to-end: enqueue until the job worker finishes
+    job_id = response.json()["jobId"]
+    while time.monotonic() - start < JOB_WAIT_LIMIT_SECONDS:
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        try:
+            status = (await ctx.client.get(f"/jobs/{job_id}", headers=ctx.headers(user))).json()["data"]["status"]
+        except (httpx.HTTPError, KeyError, ValueError):
+            continue
+        if status in ("completed", "error"):
+            ctx.recorder.record("evaluate (job)", time.monotonic() - start, status == "completed")
+            return
+    ctx.recorder.record("evaluate (job)", time.monotonic() - start, False)
+
+
+async def scenario_viva(ctx: Context, user: int):
+    headers = ctx.headers(user)
+    response = await ctx.call(
+        "interview-data",
+        "POST",
+        "/interview/interview-data",
+        files={"file": ("project.pdf", ctx.pdf, "application/pdf")},
+        headers=headers,
+    )
+    if response is None or response.status_code >= 400:
+        return
+
+    session = response.json()
+    for index in range(session.get("totalQuestions", 5)):
+        data = {"sessionId": session["sessionId"], "questionIndex": str(index)}
+        if ctx.args.event_id:
+            data["eventId"] = ctx.args.event_id
+        answer = await ctx.call(
+            "answer-audio",
+            "POST",
+            "/interview/answer-audio",
+            data=data,
+            files={"file": ("answer.wav", ctx.audio, "audio/wav")},
+            headers=headers,
+        )
+        if answer is None or answer.status_code >= 400:
+            return
+
+
+SCENARIOS: Dict[str, Callable[[Context, int], Awaitable[None]]] = {
+    "leaderboard": scenario_leaderboard,
+    "my-team": scenario_my_team,
+    "my-submissions": scenario_my_submissions,
+    "open-teams": scenario_open_teams,
+    "tts": scenario_tts,
+    "ppt": scenario_ppt,
+    "evaluate": scenario_evaluate,
+    "viva": scenario_viva,
+}
+
+# these need an event (and a logged-in member of a team in it)
+EVENT_SCENARIOS = {"leaderboard", "my-team", "my-submissions", "open-teams"}
+AUTH_SCENARIOS = EVENT_SCENARIOS | {"viva"}
+
+
+def parse_mix(spec: str, args) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"unknown scenario '{name}', choose from {', '.join(SCENARIOS)}")
+        if name in EVENT_SCENARIOS and not args.event_id:
+            continue
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+# ------------ LOAD ------------
+async def virtual_user(ctx: Context, user: int, mix: Dict[str, float], deadline: float):
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        await SCENARIOS[random.choices(names, weights)[0]](ctx, user)
+        if ctx.args.think_ms:
+            await asyncio.sleep(random.expovariate(1000 / ctx.args.think_ms))
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url.rstrip("/"), limits=limits, timeout=timeout) as client:
+        tokens = list(args.token or [])
+        if args.tokens_file:
+            with open(args.tokens_file, "r", encoding="utf-8") as f:
+                tokens += [line.strip() for line in f if line.strip()]
+        if args.username:
+            tokens.append(await login(client, args.username, args.password or ""))
+
+        mix = parse_mix(args.mix, args)
+        if not tokens:
+            mix = {k: v for k, v in mix.items() if k not in AUTH_SCENARIOS}
+        if not mix:
+            raise SystemExit("nothing to run: the mix is empty for the given event id / credentials")
+
+        results = {"mix": mix, "stages": []}
+        for users in [int(s) for s in args.stages.split(",")]:
+            recorder = Recorder()
+            ctx = Context(args, client, recorder, tokens)
+            deadline = time.monotonic() + args.duration
+            await asyncio.gather(*(virtual_user(ctx, u, mix, deadline) for u in range(users)))
+
+            rows = recorder.report()
+            print_table(f"{users} virtual users, {args.duration}s", rows)
+            results["stages"].append({"users": users, "routes": rows})
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the backend")
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8000/api"))
+    parser.add_argument("--token", action="append", help="bearer token; repeat for several users")
+    parser.add_argument("--tokens-file", help="one bearer token per line, spread over the virtual users")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--event-id", help="event used by the team/leaderboard routes")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    parser.add_argument("--stages", default="10", help="virtual users per stage, e.g. 10,25,50,100")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per stage")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between scenarios")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--repos", default=DEFAULT_REPOS, help="comma-separated repos for /evaluate")
+    parser.add_argument(
+        "--distinct-payloads", type=int, default=20,
+        help="distinct topics/descriptions; fewer means more duplicate requests",
+    )
+    parser.add_argument("--wait-jobs", action="store_true", help="also time /evaluate jobs to completion")
+    parser.add_argument("--pdf", help="project PDF for the viva scenario")
+    parser.add_argument("--pptx", help="deck for the ppt scenario")
+    parser.add_argument("--audio", help="answer recording for the viva scenario")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="print failed requests")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
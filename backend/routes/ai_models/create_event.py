@@ -1,14 +1,16 @@
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import json
-import os
+
+from utils.llm_gateway import complete
+from utils.single_flight import normalize_text, payload_key, single_flight
 
 load_dotenv()
 
-groq_api_key = os.getenv("GROQ_API_KEY")
-llm = ChatGroq(api_key=groq_api_key, model="llama-3.1-8b-instant")
+# Groq through the gateway's OpenAI-compatible endpoint; 0.7 was ChatGroq's default
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_TEMPERATURE = 0.7
 
 router = APIRouter(tags=["AI Models"])
 
@@ -33,7 +35,12 @@ async def create_event_summary(data: EventDetails):
     Summary:
     """
 
-    summary = await llm.apredict(prompt)
+    # sampled, so the gateway will not share it; organisers re-submitting the
+    # same details while the first summary is being written still get that one
+    key = payload_key("event-summary", {"event_details": normalize_text(data.event_details)})
+    summary = await single_flight(
+        key, lambda: complete(prompt, model=GROQ_MODEL, temperature=GROQ_TEMPERATURE, provider="groq")
+    )
     return {"summary": summary.strip()}
 
 
@@ -85,7 +92,7 @@ async def create_event_ai(data: EventDetails):
     Return ONLY the JSON.
     """
 
-    raw = await llm.apredict(prompt)
+    raw = await complete(prompt, model=GROQ_MODEL, temperature=GROQ_TEMPERATURE, provider="groq")
 
     try:
         parsed = json.loads(raw)
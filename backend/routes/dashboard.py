@@ -1,9 +1,23 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
 import cloudinary.uploader
 from middlewares.auth_required import get_user as get_current_user, auth_required
 from config.db import db
 from bson import ObjectId
 from utils.serializers import serialize_doc,serialize_docs
+from graph.similarity_index import find_similar
+from graph.github import run_evaluation
+from graph.jobs import enqueue_job, jobs_collection, register_handler
+from routes.team import save_repo_evaluation
+from utils.repo_cache import normalize_repo_url
+from utils.llm_scheduler import BULK, llm_context
 
 router = APIRouter()
 
@@ -345,4 +359,207 @@ async def get_all_submissions(event_id: str, user=Depends(get_current_user)):
     return {
         "success": True,
         "data": grouped
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/events/{event_id}/similarity/{submission_id}")
+async def submission_similarity(event_id: str, submission_id: str, user=Depends(get_current_user)):
+    # Verify event belongs to organizer
+    event = await events_collection.find_one(
+        {"_id": ObjectId(event_id), "organizerId": ObjectId(user["id"])}
+    )
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    similar = await find_similar(event_id, submission_id)
+    return {"success": True, "data": similar}
+
+
+# ------------ BULK RE-EVALUATION ------------
+# Re-runs the evaluator over every repo submission of an event (e.g. after a
+# rubric change). The run is a durable job; each distinct repo URL is an item
+# in the run document and is marked done as soon as it finishes, so a job
+# picked up again after a crash skips the finished ones.
+
+BULK_EVALUATION_CONCURRENCY = int(os.getenv("BULK_EVALUATION_CONCURRENCY", "4"))
+
+bulk_runs_collection = db["bulk_evaluations"]
+# shared by all bulk runs in this process so two events cannot double the load
+_bulk_slots: Optional[asyncio.Semaphore] = None
+
+
+def _bulk_semaphore() -> asyncio.Semaphore:
+    global _bulk_slots
+    if _bulk_slots is None:
+        _bulk_slots = asyncio.Semaphore(BULK_EVALUATION_CONCURRENCY)
+    return _bulk_slots
+
+
+@router.post("/events/{event_id}/evaluate-all")
+async def evaluate_all_repos(event_id: str, user=Depends(get_current_user)):
+    event = await events_collection.find_one(
+        {"_id": ObjectId(event_id), "organizerId": ObjectId(user["id"])}
+    )
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    running = await bulk_runs_collection.find_one(
+        {"eventId": event_id, "status": {"$in": ["queued", "running"]}}
+    )
+    if running and running.get("jobId"):
+        # a run whose job was abandoned does not block a new one
+        job = await jobs_collection.find_one({"_id": ObjectId(running["jobId"])})
+        if not job or job["status"] not in ("queued", "running"):
+            running = None
+    if running:
+        raise HTTPException(status_code=409, detail="A bulk evaluation is already running for this event")
+
+    subs = await submissions_collection.find(
+        {"eventId": event_id, "roundId": "repo"}
+    ).to_list(None)
+
+    # one evaluation per distinct repository, fanned out to its submissions
+    items = {}
+    for sub in subs:
+        if not sub.get("repo"):
+            continue
+        url = normalize_repo_url(sub["repo"])
+        items.setdefault(url, {"url": sub["repo"], "submissions": [], "status": "pending", "error": None})
+        items[url]["submissions"].append({"submissionId": str(sub["_id"]), "teamId": sub["teamId"]})
+
+    run = {
+        "eventId": event_id,
+        "status": "queued",
+        "items": list(items.values()),
+        "total": len(items),
+        "done": 0,
+        "failed": 0,
+        "reposPerMinute": 0.0,
+        "createdAt": datetime.utcnow(),
+    }
+    res = await bulk_runs_collection.insert_one(run)
+    run_id = str(res.inserted_id)
+
+    # eventId lets the organizer read the job (graph.jobs access check)
+    job_id = await enqueue_job("bulk_evaluate", {"runId": run_id, "eventId": event_id})
+    await bulk_runs_collection.update_one({"_id": res.inserted_id}, {"$set": {"jobId": job_id}})
+
+    return JSONResponse(
+        {
+            "success": True,
+            "runId": run_id,
+            "jobId": job_id,
+            "repos": len(items),
+            "submissions": sum(len(i["submissions"]) for i in items.values()),
+            "eventsUrl": f"/jobs/{job_id}/events",
+        },
+        status_code=202,
+    )
+
+
+@router.get("/events/{event_id}/evaluate-all/{run_id}")
+async def bulk_evaluation_status(event_id: str, run_id: str, user=Depends(get_current_user)):
+    event = await events_collection.find_one(
+        {"_id": ObjectId(event_id), "organizerId": ObjectId(user["id"])}
+    )
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    run = await bulk_runs_collection.find_one({"_id": ObjectId(run_id), "eventId": event_id})
+    if not run:
+        raise HTTPException(status_code=404, detail="Bulk evaluation not found")
+
+    return {"success": True, "data": serialize_doc(run)}
+
+
+async def run_bulk_evaluation_job(job, report):
+    run_id = ObjectId(job["payload"]["runId"])
+    run = await bulk_runs_collection.find_one({"_id": run_id})
+    if not run:
+        raise RuntimeError("Bulk evaluation run not found")
+
+    await bulk_runs_collection.update_one({"_id": run_id}, {"$set": {"status": "running"}})
+
+    total = run["total"]
+    # throughput counts only repos finished since this (re)start
+    started = time.monotonic()
+    finished_here = 0
+    lock = asyncio.Lock()
+
+    async def progress(index: int, status: str, error: Optional[str]):
+        nonlocal finished_here
+        async with lock:
+            finished_here += 1
+            minutes = (time.monotonic() - started) / 60
+            rate = round(finished_here / minutes, 2) if minutes > 0 else 0.0
+            counter = "done" if status == "completed" else "failed"
+            updated = await bulk_runs_collection.find_one_and_update(
+                {"_id": run_id},
+                {
+                    "$set": {
+                        f"items.{index}.status": status,
+                        f"items.{index}.error": error,
+                        "reposPerMinute": rate,
+                    },
+                    "$inc": {counter: 1},
+                },
+                return_document=ReturnDocument.AFTER,
+            )
+            await report("progress", {
+                "done": updated["done"],
+                "failed": updated["failed"],
+                "total": total,
+                "reposPerMinute": rate,
+            })
+
+    async def evaluate(index: int, item: dict):
+        async with _bulk_semaphore():
+            try:
+                evaluation = await run_evaluation(item["url"], "")
+                for s in item["submissions"]:
+                    await save_repo_evaluation(run["eventId"], s["submissionId"], s["teamId"], evaluation)
+            except Exception as e:
+                print("Bulk evaluation error:", item["url"], e)
+                await progress(index, "error", str(e))
+                return
+        await progress(index, "completed", None)
+
+    # items finished before a crash are skipped on resume; failed ones are retried
+    pending = [
+        (i, item) for i, item in enumerate(run["items"]) if item["status"] != "completed"
+    ]
+    if run.get("failed"):
+        await bulk_runs_collection.update_one({"_id": run_id}, {"$set": {"failed": 0}})
+    with llm_context(priority=BULK, event=run["eventId"]):
+        await asyncio.gather(*(evaluate(i, item) for i, item in pending))
+
+    final = await bulk_runs_collection.find_one_and_update(
+        {"_id": run_id},
+        {"$set": {"status": "completed", "finishedAt": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return {
+        "runId": str(run_id),
+        "done": final["done"],
+        "failed": final["failed"],
+        "total": total,
+        "reposPerMinute": final["reposPerMinute"],
+    }
+
+
+async def fail_bulk_evaluation_job(job, error):
+    # also runs for jobs abandoned by dead workers: unfinished items get the
+    # reason, so the run does not block the next one
+    run_id = ObjectId(job["payload"]["runId"])
+    run = await bulk_runs_collection.find_one({"_id": run_id}, {"items.status": 1})
+    if not run:
+        return
+    update = {"status": "error", "error": error, "finishedAt": datetime.utcnow()}
+    for i, item in enumerate(run.get("items", [])):
+        if item["status"] not in ("completed", "error"):
+            update[f"items.{i}.status"] = "error"
+            update[f"items.{i}.error"] = error
+    await bulk_runs_collection.update_one({"_id": run_id}, {"$set": update})
+
+
+register_handler("bulk_evaluate", run_bulk_evaluation_job, on_failure=fail_bulk_evaluation_job)
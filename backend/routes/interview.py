@@ -6,6 +6,7 @@ from fastapi import (
     HTTPException,
     Form,
     Body,
+    Request,
 )
 from fastapi.responses import StreamingResponse
 from middlewares.auth_required import auth_required
@@ -16,14 +17,16 @@ import cloudinary.uploader
 import whisper
 import tempfile
 from config.db import db
-from langchain_openai import ChatOpenAI
 import os
 import torch
 from dotenv import load_dotenv
 import asyncio
 import re
 import io
-from openai import OpenAI
+from typing import Any, Dict, Optional
+from utils.llm_gateway import complete, speech, transcribe
+from utils.markdown_stream import Emit, markdown_stream, stored_markdown
+from utils.single_flight import single_flight
 
 load_dotenv()
 
@@ -33,16 +36,15 @@ OPEN_AI_KEY = os.getenv("OPEN_AI_KEY")
 if not OPEN_AI_KEY:
     raise RuntimeError("OPEN_AI_KEY is not set")
 
-client = OpenAI(api_key=OPEN_AI_KEY)
-
 use_gpu = torch.cuda.is_available()
 
-llm = ChatOpenAI(
-    model_name="gpt-4o-mini",
-    temperature=0.2,
-    max_tokens=512,
-    openai_api_key=OPEN_AI_KEY,
-)
+LLM_MODEL = "gpt-4o-mini"
+LLM_TEMPERATURE = 0.2
+LLM_MAX_TOKENS = 512
+# "local" runs Whisper in-process; "openai" sends audio to the provider's
+# transcription endpoint (or whatever OPENAI_BASE_URL points at)
+STT_PROVIDER = os.getenv("STT_PROVIDER", "local")
+STT_MODEL = os.getenv("STT_MODEL", "whisper-1")
 
 _whisper_model = None
 _whisper_lock = asyncio.Lock()
@@ -51,6 +53,10 @@ submissions_collection = db["submissions"]
 viva_sessions_collection = db["viva_sessions"]
 teams_collection = db["teams"]
 
+# summaries being written, by session: the text so far and every stream
+# following it, so a reconnecting client joins the one generation
+_live_summaries: Dict[str, Dict[str, Any]] = {}
+
 
 async def get_whisper_model():
     global _whisper_model
@@ -64,6 +70,14 @@ async def get_whisper_model():
 
 
 async def transcribe_audio(path: str) -> str:
+    if STT_PROVIDER != "local":
+        with open(path, "rb") as f:
+            audio = f.read()
+        text = (await transcribe(audio, os.path.basename(path), STT_MODEL, STT_PROVIDER)).strip()
+        if not text:
+            raise HTTPException(500, "Transcription failed.")
+        return text
+
     model = await get_whisper_model()
     loop = asyncio.get_running_loop()
     result = await loop.run_in_executor(
@@ -117,6 +131,16 @@ def parse_score_feedback(text: str) -> dict:
     return {"score": score, "feedback": feedback}
 
 
+async def ask_llm(prompt: str, on_delta: Optional[Emit] = None) -> str:
+    return await complete(
+        prompt,
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+        on_delta=on_delta,
+    )
+
+
 async def generate_interview_questions_from_pdf(pdf_text: str) -> list[str]:
     prompt = f"""
 You are an expert technical interviewer.
@@ -137,7 +161,7 @@ Return ONLY a numbered list in this format:
 4. ...
 5. ...
 """
-    response = await llm.apredict(prompt)
+    response = await ask_llm(prompt)
     return parse_numbered_list(response, expected=5)
 
 
@@ -162,12 +186,18 @@ Respond EXACTLY in this format:
 Score: <0-10>
 Feedback: <short, friendly, Indian-style feedback in 1-2 lines>
 """
-    response = await llm.apredict(prompt)
+    response = await ask_llm(prompt)
     parsed = parse_score_feedback(response)
     return parsed
 
 
-async def generate_viva_summary(pdf_text: str, questions: list[str], answers: list[str], scores: list[int]) -> str:
+async def generate_viva_summary(
+    pdf_text: str,
+    questions: list[str],
+    answers: list[str],
+    scores: list[int],
+    on_delta: Optional[Emit] = None,
+) -> str:
     qa_block_parts = []
     for q, a, s in zip(questions, answers, scores):
         qa_block_parts.append(
@@ -207,7 +237,7 @@ PDF Project Summary:
 
 Write ONLY markdown. No extra explanation.
 """
-    summary = await llm.apredict(prompt)
+    summary = await ask_llm(prompt, on_delta)
     return summary.strip()
 
 
@@ -215,18 +245,7 @@ async def synthesize_speech_bytes(text: str) -> bytes:
     if not text or not text.strip():
         raise HTTPException(400, "Empty text for TTS")
 
-    def _call():
-        resp = client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",
-            response_format="mp3",
-            input=text,
-        )
-        return resp.read()
-
-    loop = asyncio.get_running_loop()
-    audio_bytes = await loop.run_in_executor(None, _call)
-    return audio_bytes
+    return await speech(text, model="gpt-4o-mini-tts", voice="alloy", response_format="mp3")
 
 
 @router.post("/tts", response_class=StreamingResponse)
@@ -335,10 +354,12 @@ async def get_session_state(
 
 @router.post("/answer-audio")
 async def answer_audio(
+    request: Request,
     sessionId: str = Form(...),
     eventId: str | None = Form(None),
     questionIndex: int = Form(...),
     file: UploadFile = File(...),
+    streamSummary: bool = Form(False),
     user: dict = Depends(auth_required),
 ):
     try:
@@ -408,12 +429,18 @@ async def answer_audio(
     )
 
     if finished:
-        viva_summary = await generate_viva_summary(
-            session.get("pdfText", ""),
-            questions,
-            answers,
-            scores,
-        )
+        # streamSummary: the client fetches the summary from summaryUrl as it is written
+        viva_summary = None
+        if not streamSummary:
+            viva_summary = await generate_viva_summary(
+                session.get("pdfText", ""),
+                questions,
+                answers,
+                scores,
+            )
+            await viva_sessions_collection.update_one(
+                {"_id": obj_id}, {"$set": {"vivaSummary": viva_summary}}
+            )
 
         team_name = "N/A"
         team_id_str = None
@@ -459,4 +486,74 @@ async def answer_audio(
         "totalScore": total_score,
         "answeredCount": len(answers),
         "totalQuestions": max_questions,
+        # resolved through the router, so it carries the /interview prefix
+        "summaryUrl": request.url_for("stream_viva_summary", session_id=sessionId).path if finished else None,
     }
+
+
+@router.get("/session/{session_id}/summary/stream")
+async def stream_viva_summary(
+    session_id: str,
+    user: dict = Depends(auth_required),
+):
+    try:
+        obj_id = ObjectId(session_id)
+    except Exception:
+        raise HTTPException(400, "Invalid sessionId.")
+
+    session = await viva_sessions_collection.find_one({"_id": obj_id})
+    if not session:
+        raise HTTPException(404, "Session not found.")
+
+    if str(session["userId"]) != str(user["id"]):
+        raise HTTPException(403, "Unauthorized session access.")
+
+    if not session.get("isFinished"):
+        raise HTTPException(400, "Interview not completed yet.")
+
+    if session.get("vivaSummary"):
+        return stored_markdown(session["vivaSummary"])
+
+    flight_key = str(obj_id)
+    live = _live_summaries.setdefault(flight_key, {"text": [], "streams": set()})
+
+    async def fan_out(piece: str):
+        live["text"].append(piece)
+        for stream in list(live["streams"]):
+            await stream(piece)
+
+    async def generate() -> str:
+        # a flight that finished just before this one started has stored it
+        current = await viva_sessions_collection.find_one({"_id": obj_id}, {"vivaSummary": 1})
+        if current and current.get("vivaSummary"):
+            return current["vivaSummary"]
+        summary = await generate_viva_summary(
+            session.get("pdfText", ""),
+            session.get("questions") or [],
+            session.get("answers") or [],
+            session.get("scores") or [],
+            fan_out,
+        )
+        await viva_sessions_collection.update_one(
+            {"_id": obj_id}, {"$set": {"vivaSummary": summary}}
+        )
+        await submissions_collection.update_one(
+            {"userId": str(user["id"]), "roundId": "viva"},
+            {"$set": {"aiResult.vivaSummary": summary}},
+        )
+        return summary
+
+    async def produce(emit: Emit) -> dict:
+        # joining a running flight: catch up on what is already written
+        if live["text"]:
+            await emit("".join(live["text"]))
+        live["streams"].add(emit)
+        try:
+            summary = await single_flight(f"viva-summary:{flight_key}", generate)
+        finally:
+            live["streams"].discard(emit)
+            if not live["streams"] and _live_summaries.get(flight_key) is live:
+                del _live_summaries[flight_key]
+        return {"markdown": summary}
+
+    return markdown_stream(produce)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+from utils.llm_cache import cache_stats
+from utils.llm_gateway import stream_stats
+from utils.llm_scheduler import scheduler_stats
+from utils.single_flight import single_flight_stats
+
+router = APIRouter(tags=["llm"])
+
+
+@router.get("/llm/stats")
+async def llm_stats():
+    return {
+        "success": True,
+        "data": {
+            "cache": cache_stats(),
+            "scheduler": scheduler_stats(),
+            "single_flight": single_flight_stats(),
+            "streams": stream_stats(),
+        },
+    }
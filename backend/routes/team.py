@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Form,File, UploadFile
+from fastapi.responses import JSONResponse
 from middlewares.auth_required import get_user as get_current_user, auth_required
 from config.db import db
 import cloudinary.uploader
@@ -7,7 +8,10 @@ from typing import Optional
 from graph.ppt_evaluator import analyze_ppt_endpoint,analyze_ppt_with_gpt
 from utils.serializers import serialize_doc, serialize_docs
 from datetime import datetime
-from graph.github import *
+from graph.github import run_evaluation
+from graph.similarity_index import index_submission, find_similar
+from graph.jobs import enqueue_job, register_handler
+from utils.llm_scheduler import BULK, llm_context
 
 router = APIRouter()
 
@@ -307,8 +311,9 @@ async def submit_ppt(
     except Exception as e:
         raise HTTPException(500, str(e))
 
-    # run AI analysis
-    ai_result = await run_ppt_analysis(topic, file_url)
+    # run AI analysis; slide calls share the event's bulk LLM queue
+    with llm_context(event=event_id):
+        ai_result = await run_ppt_analysis(topic, file_url)
 
     # save submission
     submission = {
@@ -365,112 +370,181 @@ async def submit_repo(
         "repo": repo,
         "video": video,
         "submittedAt": datetime.utcnow(),
-        "evaluation": None,     
-        "status": "processing"
+        "evaluation": None,
+        "status": "queued"
     }
 
     result = await submissions_collection.insert_one(submission)
     submission_id = result.inserted_id
 
-    # ---------- RUN THE EVALUATOR ----------
-    loop = asyncio.get_event_loop()
+    # ---------- QUEUE THE EVALUATOR ----------
+    # the job workers run clone + analysis + LLM review and update
+    # submission.status per milestone; poll /jobs/{jobId} or my-submissions
+    job_id = await enqueue_job("submit_repo", {
+        "github_url": repo,
+        "eventId": event_id,
+        "teamId": str(team["_id"]),
+        "submissionId": str(submission_id),
+    })
+    await submissions_collection.update_one(
+        {"_id": submission_id},
+        {"$set": {"jobId": job_id}}
+    )
 
-    try:
-        # 1. Clone + static analysis (sync)
-        repo_path, chunks, radon_raw, pylint_score, plag, structure = \
-            await loop.run_in_executor(
-                executor,
-                evaluate_repo_blocking,
-                repo,
-                ""            # description optional
-            )
-
-        # 2. LLM scoring (async)
-        logic, rel, style, llm_fb = await llm_code_rating("", chunks)
-
-        # 3. Code smells + scores
-        code_smells = detect_code_smells(radon_raw, pylint_score, plag, structure)
-        risk_score = compute_risk_score(plag, pylint_score, code_smells, structure)
-        final_score = compute_final_score(plag, logic, rel, style, pylint_score, structure)
-        rubric = rubric_from_score(final_score)
-
-        # 4. Mentor + rewrite
-        mentor_md = await generate_markdown_mentor("", {
-            "final_score": final_score,
-            "rubric": rubric,
-            "risk_score": risk_score,
-            "structure": structure,
-            "plagiarism": plag,
-            "logic": logic,
-            "relevance": rel,
-            "style": style,
-            "pylint_score": pylint_score,
-            "code_smells": code_smells,
-            "files_analyzed": len(chunks),
-        })
+    return JSONResponse(
+        {
+            "success": True,
+            "message": "Repository submitted, evaluation queued",
+            "submissionId": str(submission_id),
+            "jobId": job_id,
+            "eventsUrl": f"/jobs/{job_id}/events"
+        },
+        status_code=202
+    )
 
-        rewrite_md = await generate_rewrite_suggestions("", chunks, code_smells)
-
-        # 5. PDF
-        pdf_bytes = generate_pdf_report({
-            "final_score": final_score,
-            "rubric": rubric,
-            "risk_score": risk_score,
-            "structure": structure,
-            "plagiarism": plag,
-            "logic": logic,
-            "relevance": rel,
-            "style": style,
-            "pylint_score": pylint_score,
-            "code_smells": code_smells,
-            "files_analyzed": len(chunks),
-        })
 
-        report_pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
-
-        # ---------- FINAL AI EVALUATION JSON ----------
-        evaluation = {
-            "final_score": final_score,
-            "rubric": rubric,
-            "risk_score": risk_score,
-            "structure": structure,
-            "plagiarism": plag,
-            "logic": logic,
-            "relevance": rel,
-            "style": style,
-            "pylint_score": pylint_score,
-            "code_smells": code_smells,
-            "llm_feedback": llm_fb,
-            "mentor_summary_markdown": mentor_md,
-            "rewrite_suggestions_markdown": rewrite_md,
-            "report_pdf_base64": report_pdf_base64,
-            "files_analyzed": len(chunks),
+@router.post("/events/{event_id}/resubmit/repo")
+async def resubmit_repo(
+    event_id: str,
+    repo: Optional[str] = Form(None),
+    user=Depends(get_current_user)
+):
+    # re-evaluates the team's latest push; only files changed since the
+    # previously evaluated commit are analysed and rated again. The last
+    # evaluation (and status) stays in place, so the team keeps its
+    # leaderboard entry; the rerun is tracked under `rerun` and replaces
+    # it only when it completes.
+    team = await teams_collection.find_one({
+        "eventId": event_id,
+        "members.userId": user["id"]
+    })
+    if not team:
+        raise HTTPException(400, "You are not part of any team")
+
+    existing = await submissions_collection.find_one({
+        "eventId": event_id,
+        "teamId": str(team["_id"]),
+        "roundId": "repo",
+    })
+    if not existing:
+        raise HTTPException(404, "No repository submitted for this round")
+    rerun_status = (existing.get("rerun") or {}).get("status")
+    if existing.get("status") not in ("completed", "error") or rerun_status not in (None, "error"):
+        raise HTTPException(409, "Previous evaluation is still running")
+
+    repo = repo or existing["repo"]
+    job_id = await enqueue_job("submit_repo", {
+        "github_url": repo,
+        "eventId": event_id,
+        "teamId": str(team["_id"]),
+        "submissionId": str(existing["_id"]),
+        "rerun": True,
+    })
+    await submissions_collection.update_one(
+        {"_id": existing["_id"]},
+        {"$set": {
+            "rerun": {"status": "queued", "repo": repo, "jobId": job_id, "error": None},
+            "jobId": job_id,
+            "resubmittedAt": datetime.utcnow(),
+        }}
+    )
+
+    return JSONResponse(
+        {
+            "success": True,
+            "message": "Repository resubmitted, evaluation queued",
+            "submissionId": str(existing["_id"]),
+            "jobId": job_id,
+            "eventsUrl": f"/jobs/{job_id}/events"
+        },
+        status_code=202
+    )
+
+
+async def save_repo_evaluation(event_id: str, submission_id: str, team_id: str, evaluation: dict):
+    # ---------- CROSS-TEAM SIMILARITY ----------
+    similarity = None
+    try:
+        indexed = await index_submission(
+            event_id, submission_id, team_id, evaluation.get("commit_sha")
+        )
+        if indexed:
+            similarity = await find_similar(event_id, submission_id)
+    except Exception as e:
+        print("Similarity index error:", e)
+
+    # ---------- SAVE RESULT INTO SAME SUBMISSION ----------
+    await submissions_collection.update_one(
+        {"_id": ObjectId(submission_id)},
+        {
+            "$set": {
+                "evaluation": evaluation,
+                "similarity": similarity,
+                "status": "completed"
+            },
+            "$unset": {"rerun": "", "error": ""},
         }
+    )
+
 
-        # ---------- SAVE RESULT INTO SAME SUBMISSION ----------
+# submission.status (rerun.status for a resubmission) values while the
+# evaluator runs, in order; per-chunk ratings and streamed markdown only
+# reach the job event stream
+SUBMISSION_STAGES = ["queued", "cloned", "static_analysis", "llm_rating", "mentor", "rewrite", "report"]
+
+
+async def run_submit_repo_job(job, report):
+    payload = job["payload"]
+    event_id = payload["eventId"]
+    submission_id = ObjectId(payload["submissionId"])
+    status_field = "rerun.status" if payload.get("rerun") else "status"
+
+    reached = {"index": 0}
+
+    async def on_stage(stage, data):
+        # every event goes to the job stream; the submission only records
+        # milestones, and never moves back (mentor and rewrite race)
+        await report(stage, data)
+        if stage not in SUBMISSION_STAGES:
+            return
+        index = SUBMISSION_STAGES.index(stage)
+        if index <= reached["index"]:
+            return
+        reached["index"] = index
         await submissions_collection.update_one(
             {"_id": submission_id},
-            {
-                "$set": {
-                    "evaluation": evaluation,
-                    "status": "completed"
-                }
-            }
+            {"$set": {status_field: stage}}
         )
 
-        return {
-            "success": True,
-            "message": "Repository submitted and evaluation completed",
-            "submissionId": str(submission_id),
-            "evaluation": evaluation
-        }
-
-    except Exception as e:
+    # clone + static analysis + LLM review + report, or the stored
+    # evaluation when this commit was already evaluated
+    with llm_context(priority=BULK, event=event_id):
+        evaluation = await run_evaluation(payload["github_url"], "", on_stage)    # description optional
+    if payload.get("rerun"):
         await submissions_collection.update_one(
             {"_id": submission_id},
-            {"$set": {"status": "error", "error": str(e)}}
+            {"$set": {"repo": payload["github_url"]}}
         )
-        raise HTTPException(500, f"Evaluation failed: {str(e)}")
+    await save_repo_evaluation(event_id, payload["submissionId"], payload["teamId"], evaluation)
+
+    return {"submissionId": payload["submissionId"]}
+
+
+async def fail_submit_repo_job(job, error):
+    # also runs for jobs abandoned by dead workers, so the team can resubmit;
+    # a failed rerun leaves the previous evaluation in place
+    payload = job["payload"]
+    if payload.get("rerun"):
+        update = {"rerun.status": "error", "rerun.error": error}
+    else:
+        update = {"status": "error", "error": error}
+    await submissions_collection.update_one(
+        {"_id": ObjectId(payload["submissionId"])},
+        {"$set": update}
+    )
+
+
+register_handler("submit_repo", run_submit_repo_job, on_failure=fail_submit_repo_job)
 
 
 @router.get("/events/{event_id}/my-submissions")
@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo import ASCENDING
+
+from config.db import db
+
+# Response cache for deterministic (temperature 0) LLM calls. A small LRU in
+# memory answers repeats inside this process; Mongo keeps responses across
+# restarts and workers. Stored entries expire through a TTL index and the
+# least recently used ones are evicted once the collection outgrows
+# LLM_CACHE_MAX_ENTRIES.
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_LRU_SIZE = int(os.getenv("LLM_CACHE_LRU_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+# the size check costs a count, so it runs every this many writes
+EVICTION_CHECK_EVERY = 200
+
+llm_cache_collection = db["llm_cache"]
+
+_lru: "OrderedDict[str, str]" = OrderedDict()
+_indexes_ready = False
+_writes = 0
+stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "writes": 0, "evicted": 0, "errors": 0}
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    # model, messages and every sampling parameter; key order does not matter
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, value: str):
+    _lru[key] = value
+    _lru.move_to_end(key)
+    while len(_lru) > LLM_CACHE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+async def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    await llm_cache_collection.create_index("createdAt", expireAfterSeconds=LLM_CACHE_TTL_SECONDS)
+    await llm_cache_collection.create_index([("lastUsedAt", ASCENDING)])
+    _indexes_ready = True
+
+
+async def get_cached(key: str) -> Optional[str]:
+    if key in _lru:
+        _lru.move_to_end(key)
+        stats["memory_hits"] += 1
+        return _lru[key]
+
+    try:
+        record = await llm_cache_collection.find_one_and_update(
+            {"_id": key}, {"$set": {"lastUsedAt": datetime.utcnow()}}
+        )
+    except Exception as e:
+        # the cache never fails a call
+        print("LLM cache read error:", e)
+        stats["errors"] += 1
+        record = None
+
+    if not record:
+        stats["misses"] += 1
+        return None
+
+    stats["store_hits"] += 1
+    _remember(key, record["value"])
+    return record["value"]
+
+
+async def put_cached(key: str, value: str, model: str):
+    global _writes
+    _remember(key, value)
+    try:
+        await _ensure_indexes()
+        now = datetime.utcnow()
+        await llm_cache_collection.replace_one(
+            {"_id": key},
+            {"_id": key, "model": model, "value": value, "createdAt": now, "lastUsedAt": now},
+            upsert=True,
+        )
+        stats["writes"] += 1
+        _writes += 1
+        if _writes % EVICTION_CHECK_EVERY == 0:
+            await evict_overflow()
+    except Exception as e:
+        print("LLM cache write error:", e)
+        stats["errors"] += 1
+
+
+async def evict_overflow():
+    overflow = await llm_cache_collection.estimated_document_count() - LLM_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    oldest = await llm_cache_collection.find({}, {"_id": 1}).sort("lastUsedAt", ASCENDING).limit(overflow).to_list(None)
+    res = await llm_cache_collection.delete_many({"_id": {"$in": [d["_id"] for d in oldest]}})
+    stats["evicted"] += res.deleted_count
+
+
+def cache_stats() -> Dict[str, Any]:
+    lookups = stats["memory_hits"] + stats["store_hits"] + stats["misses"]
+    hits = stats["memory_hits"] + stats["store_hits"]
+    return {
+        **stats,
+        "enabled": LLM_CACHE_ENABLED,
+        "lru_entries": len(_lru),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+    }
@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from utils.llm_cache import LLM_CACHE_ENABLED, cache_key, get_cached, put_cached
+from utils.llm_scheduler import scheduler_for
+from utils.single_flight import single_flight
+
+# One gateway for every LLM / TTS / STT call in the backend. All providers speak
+# the OpenAI REST API (Groq through its OpenAI-compatible endpoint), so a
+# single pooled HTTP/2 client serves them all. Admission per model (slots,
+# token budget, priority) is decided by utils.llm_scheduler, and 429 / 5xx /
+# transport errors are retried with jittered exponential backoff, without
+# holding the scheduler slot while waiting. Identical deterministic calls
+# that are already in flight are coalesced into one.
+# Long markdown answers can be streamed; time to first token is recorded per
+# model, since that is what a reader waiting on a streamed answer notices.
+
+PROVIDERS = {
+    "openai": {
+        "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+        # both spellings are used in this repo's .env files
+        "api_key": os.getenv("OPENAI_API_KEY") or os.getenv("OPEN_AI_KEY", ""),
+    },
+    "groq": {
+        "base_url": os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1"),
+        "api_key": os.getenv("GROQ_API_KEY", ""),
+    },
+}
+
+DEFAULT_MODEL = "gpt-4o-mini"
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_CAP = 20.0
+# in-flight requests per model; LLM_MODEL_CONCURRENCY="gpt-4o-mini=16,tts-1=4"
+# overrides single models
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+MODEL_CONCURRENCY = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("LLM_MODEL_CONCURRENCY", "").split(",") if "=" in item
+    )
+}
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# completion tokens assumed when the caller sets no max_tokens
+EXPECTED_COMPLETION_TOKENS = 512
+# streamed calls kept per model for the time-to-first-token percentiles
+TTFT_WINDOW = 500
+
+_client: Optional[httpx.AsyncClient] = None
+_ttft: Dict[str, Deque[float]] = {}
+
+
+class LLMError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def _http() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+        )
+        try:
+            _client = httpx.AsyncClient(http2=True, limits=limits, timeout=LLM_TIMEOUT)
+        except ImportError:
+            # the h2 extra is not installed: pooled HTTP/1.1 keep-alive instead
+            _client = httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT)
+    return _client
+
+
+def _estimate_tokens(payload: Dict[str, Any]) -> int:
+    # ~4 characters per token; images are billed far below their base64 length
+    prompt = json.dumps(payload.get("messages") or payload.get("input") or "")
+    return len(prompt) // 4 + payload.get("max_tokens", EXPECTED_COMPLETION_TOKENS)
+
+
+def _used_tokens(response: httpx.Response) -> Optional[int]:
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return None
+    try:
+        return response.json().get("usage", {}).get("total_tokens")
+    except ValueError:
+        return None
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        try:
+            return min(LLM_BACKOFF_CAP, float(response.headers["retry-after"]))
+        except (KeyError, ValueError):
+            pass
+    # full jitter
+    return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+async def request(
+    path: str,
+    payload: Dict[str, Any],
+    provider: str = "openai",
+    timeout: Optional[float] = None,
+    files: Optional[Dict[str, Any]] = None,
+) -> httpx.Response:
+    """
+    POST `payload` to the provider, retrying rate limits and server errors.
+    With `files` the payload goes out as multipart form fields instead of JSON.
+    """
+    conf = PROVIDERS[provider]
+    if not conf["api_key"]:
+        raise LLMError(f"API key for {provider} is not set")
+
+    url = conf["base_url"].rstrip("/") + path
+    headers = {"Authorization": f"Bearer {conf['api_key']}"}
+    model = payload.get("model", DEFAULT_MODEL)
+    scheduler = scheduler_for(model, MODEL_CONCURRENCY.get(model, LLM_CONCURRENCY))
+    estimated = _estimate_tokens(payload)
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        # the slot covers the call only; others use it while this one backs off
+        async with scheduler.slot(estimated):
+            try:
+                if files:
+                    response = await _http().post(
+                        url, data=payload, files=files, headers=headers, timeout=timeout or LLM_TIMEOUT
+                    )
+                else:
+                    response = await _http().post(
+                        url, json=payload, headers=headers, timeout=timeout or LLM_TIMEOUT
+                    )
+                if response.status_code < 400:
+                    scheduler.settle(estimated, _used_tokens(response))
+                    return response
+                if response.status_code not in RETRY_STATUS:
+                    raise LLMError(
+                        f"{provider} {response.status_code}: {response.text[:500]}",
+                        response.status_code,
+                    )
+                error = LLMError(f"{provider} {response.status_code}", response.status_code)
+            except httpx.TransportError as e:
+                error = LLMError(f"{provider} request failed: {e}")
+            # the retry is charged again when it is admitted
+            scheduler.settle(estimated, 0)
+
+        if attempt == LLM_MAX_RETRIES:
+            raise error
+        await asyncio.sleep(_backoff(attempt, response))
+
+
+async def stream_request(
+    path: str,
+    payload: Dict[str, Any],
+    provider: str = "openai",
+    timeout: Optional[float] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    request() for `"stream": true` calls, yielding the parsed event chunks.
+    Failures before the first chunk are retried; after it the caller has
+    already passed text on, so they are raised.
+    """
+    conf = PROVIDERS[provider]
+    if not conf["api_key"]:
+        raise LLMError(f"API key for {provider} is not set")
+
+    url = conf["base_url"].rstrip("/") + path
+    headers = {"Authorization": f"Bearer {conf['api_key']}"}
+    model = payload.get("model", DEFAULT_MODEL)
+    scheduler = scheduler_for(model, MODEL_CONCURRENCY.get(model, LLM_CONCURRENCY))
+    estimated = _estimate_tokens(payload)
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        response = None
+        started = False
+        async with scheduler.slot(estimated):
+            try:
+                async with _http().stream(
+                    "POST", url, json=payload, headers=headers, timeout=timeout or LLM_TIMEOUT
+                ) as response:
+                    if response.status_code < 400:
+                        used = None
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            # Groq reports usage under x_groq
+                            usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage") or {}
+                            used = usage.get("total_tokens", used)
+                            started = True
+                            yield chunk
+                        scheduler.settle(estimated, used)
+                        return
+
+                    await response.aread()
+                    if response.status_code not in RETRY_STATUS:
+                        raise LLMError(
+                            f"{provider} {response.status_code}: {response.text[:500]}",
+                            response.status_code,
+                        )
+                    error = LLMError(f"{provider} {response.status_code}", response.status_code)
+            except httpx.TransportError as e:
+                if started:
+                    raise LLMError(f"{provider} stream interrupted: {e}")
+                error = LLMError(f"{provider} request failed: {e}")
+            scheduler.settle(estimated, 0)
+
+        if attempt == LLM_MAX_RETRIES:
+            raise error
+        await asyncio.sleep(_backoff(attempt, response))
+
+
+# ------------ COMMON INTERFACE ------------
+async def chat(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0,
+    json_mode: bool = False,
+    max_tokens: Optional[int] = None,
+    provider: str = "openai",
+    timeout: Optional[float] = None,
+    cache: bool = True,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> str:
+    """
+    Chat completion content. Temperature-0 calls are answered from
+    utils.llm_cache when the same provider, model, messages and parameters
+    were seen before, and share one request with identical calls already in
+    flight; pass cache=False to force a fresh call. With `on_delta` a
+    plain-text answer is streamed and every piece is handed to it as it
+    arrives; the full text is still returned.
+    """
+    if on_delta is not None and not json_mode:
+        parts = []
+        async for piece in chat_stream(messages, model, temperature, max_tokens, provider, timeout, cache):
+            parts.append(piece)
+            await on_delta(piece)
+        return "".join(parts)
+
+    payload: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+
+    if temperature != 0:
+        # sampled answers are meant to differ, so they are never shared
+        return await _chat(payload, provider, timeout, None, json_mode)
+
+    key = cache_key({"provider": provider, **payload})
+    use_cache = cache and LLM_CACHE_ENABLED
+    return await single_flight(
+        "chat:" + key + ("" if use_cache else ":fresh"),
+        lambda: _chat(payload, provider, timeout, key if use_cache else None, json_mode),
+    )
+
+
+async def _chat(
+    payload: Dict[str, Any],
+    provider: str,
+    timeout: Optional[float],
+    key: Optional[str],
+    json_mode: bool,
+) -> str:
+    if key:
+        cached = await get_cached(key)
+        if cached is not None:
+            return cached
+
+    response = await request("/chat/completions", payload, provider, timeout)
+    content = response.json()["choices"][0]["message"]["content"] or ""
+
+    if key and content and _cacheable(content, json_mode):
+        await put_cached(key, content, payload["model"])
+    return content
+
+
+async def chat_stream(
+    messages: List[Dict[str, Any]],
+    model: str = DEFAULT_MODEL,
+    temperature: float = 0,
+    max_tokens: Optional[int] = None,
+    provider: str = "openai",
+    timeout: Optional[float] = None,
+    cache: bool = True,
+) -> AsyncIterator[str]:
+    """Chat completion content piece by piece, as the model writes it. Shares chat()'s cache."""
+    payload: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+
+    key = None
+    if cache and LLM_CACHE_ENABLED and temperature == 0:
+        key = cache_key({"provider": provider, **payload})
+        cached = await get_cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+    streamed = {**payload, "stream": True}
+    if provider == "openai":
+        streamed["stream_options"] = {"include_usage": True}
+
+    start = time.monotonic()
+    parts: List[str] = []
+    async for chunk in stream_request("/chat/completions", streamed, provider, timeout):
+        for choice in chunk.get("choices") or []:
+            piece = (choice.get("delta") or {}).get("content")
+            if not piece:
+                continue
+            if not parts:
+                # includes the wait for a scheduler slot: that is what the reader sees
+                _ttft.setdefault(model, deque(maxlen=TTFT_WINDOW)).append(time.monotonic() - start)
+            parts.append(piece)
+            yield piece
+
+    content = "".join(parts)
+    if key and content:
+        await put_cached(key, content, model)
+
+
+def stream_stats() -> Dict[str, Any]:
+    stats = {}
+    for model, samples in _ttft.items():
+        ordered = sorted(samples)
+        stats[model] = {
+            "streams": len(ordered),
+            "ttft_p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "ttft_p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        }
+    return stats
+
+
+def _cacheable(content: str, json_mode: bool) -> bool:
+    # a malformed JSON answer would otherwise be replayed on every retry
+    if not json_mode:
+        return True
+    try:
+        json.loads(content)
+        return True
+    except ValueError:
+        return False
+
+
+async def chat_json(messages: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+    """chat() in JSON mode, parsed. Raises ValueError on malformed JSON."""
+    return json.loads(await chat(messages, json_mode=True, **kwargs))
+
+
+async def complete(prompt: str, **kwargs) -> str:
+    # single user prompt, the shape LangChain's apredict() took
+    return await chat([{"role": "user", "content": prompt}], **kwargs)
+
+
+async def speech(
+    text: str,
+    model: str = "tts-1",
+    voice: str = "alloy",
+    response_format: str = "mp3",
+    provider: str = "openai",
+) -> bytes:
+    payload = {"model": model, "voice": voice, "input": text, "response_format": response_format}
+    return await single_flight(
+        "speech:" + cache_key({"provider": provider, **payload}),
+        lambda: _speech(payload, provider),
+    )
+
+
+async def _speech(payload: Dict[str, Any], provider: str) -> bytes:
+    response = await request("/audio/speech", payload, provider)
+    return response.content
+
+
+async def transcribe(
+    audio: bytes,
+    filename: str = "audio.webm",
+    model: str = "whisper-1",
+    provider: str = "openai",
+) -> str:
+    response = await request(
+        "/audio/transcriptions",
+        {"model": model, "temperature": "0"},
+        provider,
+        files={"file": (filename, audio)},
+    )
+    return response.json().get("text", "")
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
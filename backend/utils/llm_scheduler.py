@@ -0,0 +1,199 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Admission control in front of every model. Two priority classes:
+#   interactive - a person is waiting (viva grading, question generation, TTS)
+#   bulk        - background grading (repo chunks, slides, mentor reports)
+# Interactive requests always go first, and a few concurrency slots plus a
+# share of the token-per-minute budget are held back for them, so a bulk
+# re-evaluation cannot fill the provider quota. Bulk requests are served
+# round-robin per event, so one large event does not starve the others.
+# Priority and event travel with the request through context variables.
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# tokens per minute per model; LLM_MODEL_TPM="gpt-4o-mini=2000000" overrides
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+MODEL_TPM = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("LLM_MODEL_TPM", "").split(",") if "=" in item
+    )
+}
+# held back from bulk work
+INTERACTIVE_SLOTS = int(os.getenv("LLM_INTERACTIVE_SLOTS", "2"))
+INTERACTIVE_TPM_SHARE = float(os.getenv("LLM_INTERACTIVE_TPM_SHARE", "0.2"))
+
+llm_priority: ContextVar[str] = ContextVar("llm_priority", default=INTERACTIVE)
+llm_event: ContextVar[Optional[str]] = ContextVar("llm_event", default=None)
+
+
+@contextmanager
+def llm_context(priority: Optional[str] = None, event: Optional[str] = None):
+    """Tags every LLM call made inside the block (and tasks it starts)."""
+    tokens = []
+    if priority is not None:
+        tokens.append((llm_priority, llm_priority.set(priority)))
+    if event is not None:
+        tokens.append((llm_event, llm_event.set(event)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+Waiter = Tuple[asyncio.Future, int]
+
+
+class ModelScheduler:
+    def __init__(self, concurrency: int, tpm: int):
+        self.capacity = concurrency
+        self.bulk_capacity = max(1, concurrency - INTERACTIVE_SLOTS)
+        self.tpm = tpm
+        self.bulk_floor = tpm * INTERACTIVE_TPM_SHARE
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.running = 0
+        self.running_bulk = 0
+        self.interactive: Deque[Waiter] = deque()
+        self.bulk: "OrderedDict[str, Deque[Waiter]]" = OrderedDict()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.granted = {INTERACTIVE: 0, BULK: 0}
+
+    # ------------ TOKEN BUCKET ------------
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.tpm, self.tokens + (now - self.updated) * self.tpm / 60)
+        self.updated = now
+
+    def _fits(self, priority: str, cost: int) -> bool:
+        if self.running >= self.capacity:
+            return False
+        if priority == INTERACTIVE:
+            return self.tokens >= cost
+        return self.running_bulk < self.bulk_capacity and self.tokens - cost >= self.bulk_floor
+
+    def _grant(self, priority: str, fut: asyncio.Future, cost: int):
+        self.tokens -= cost
+        self.running += 1
+        if priority == BULK:
+            self.running_bulk += 1
+        self.granted[priority] += 1
+        fut.set_result(None)
+
+    # ------------ DISPATCH ------------
+    def _dispatch(self):
+        self._refill()
+        blocked_cost = None
+
+        while self.interactive:
+            fut, cost = self.interactive[0]
+            if fut.done():
+                self.interactive.popleft()
+                continue
+            if not self._fits(INTERACTIVE, cost):
+                blocked_cost = cost
+                break
+            self.interactive.popleft()
+            self._grant(INTERACTIVE, fut, cost)
+
+        # bulk only runs when no interactive request is waiting
+        if not self.interactive:
+            progressed = True
+            while self.bulk and progressed:
+                progressed = False
+                for event in list(self.bulk.keys()):
+                    queue = self.bulk[event]
+                    while queue and queue[0][0].done():
+                        queue.popleft()
+                    if not queue:
+                        del self.bulk[event]
+                        continue
+                    fut, cost = queue[0]
+                    if not self._fits(BULK, cost):
+                        blocked_cost = cost + self.bulk_floor
+                        break
+                    queue.popleft()
+                    self._grant(BULK, fut, cost)
+                    # round robin: the event just served goes to the back
+                    self.bulk.move_to_end(event)
+                    progressed = True
+                    break
+
+        # waiting on tokens rather than on a free slot: wake up when refilled
+        if blocked_cost is not None and self.timer is None and self.tokens < blocked_cost:
+            delay = (blocked_cost - self.tokens) * 60 / self.tpm
+            self.timer = asyncio.get_event_loop().call_later(max(0.05, delay), self._wake)
+
+    def _wake(self):
+        self.timer = None
+        self._dispatch()
+
+    async def acquire(self, priority: str, event: Optional[str], cost: int):
+        # a single request may never need more than its class can ever have
+        cost = min(cost, self.tpm if priority == INTERACTIVE else int(self.tpm - self.bulk_floor))
+        fut = asyncio.get_event_loop().create_future()
+        if priority == INTERACTIVE:
+            self.interactive.append((fut, cost))
+        else:
+            self.bulk.setdefault(event or "", deque()).append((fut, cost))
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(priority)
+            raise
+
+    def release(self, priority: str):
+        self.running -= 1
+        if priority == BULK:
+            self.running_bulk -= 1
+        self._dispatch()
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        # charge what the provider reports instead of the estimate
+        if actual is not None:
+            self.tokens = min(self.tpm, self.tokens + estimated - actual)
+
+    @asynccontextmanager
+    async def slot(self, cost: int):
+        priority = llm_priority.get()
+        await self.acquire(priority, llm_event.get(), cost)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "running": self.running,
+            "running_bulk": self.running_bulk,
+            "waiting_interactive": len(self.interactive),
+            "waiting_bulk": sum(len(q) for q in self.bulk.values()),
+            "events_waiting": len(self.bulk),
+            "tokens_available": int(self.tokens),
+            "tpm": self.tpm,
+            "granted": dict(self.granted),
+        }
+
+
+_schedulers: Dict[str, ModelScheduler] = {}
+
+
+def scheduler_for(model: str, concurrency: int) -> ModelScheduler:
+    if model not in _schedulers:
+        _schedulers[model] = ModelScheduler(concurrency, MODEL_TPM.get(model, LLM_TPM))
+    return _schedulers[model]
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    return {model: s.stats() for model, s in _schedulers.items()}
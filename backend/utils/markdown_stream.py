@@ -0,0 +1,72 @@
+import json
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Server-sent events for long markdown answers. `produce(emit)` generates the
+# text, calling emit(piece) for every piece the model streams, and returns
+# the final payload. Each piece goes out as a `delta` event when it arrives
+# and the payload as `done` (or `error`). produce runs in its own task, so a
+# client that disconnects halfway does not stop the text from being finished
+# and persisted.
+
+# comment frames keep proxies from closing a quiet stream
+KEEPALIVE_SECONDS = 15
+
+Emit = Callable[[str], Awaitable[None]]
+
+# running producers; the loop itself only keeps weak references to tasks
+_producers: Set[asyncio.Task] = set()
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def markdown_stream(produce: Callable[[Emit], Awaitable[Any]]) -> StreamingResponse:
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def emit(piece: str):
+        queue.put_nowait(("delta", {"text": piece}))
+
+    async def run():
+        try:
+            queue.put_nowait(("done", await produce(emit)))
+        except HTTPException as e:
+            queue.put_nowait(("error", {"error": e.detail}))
+        except Exception as e:
+            print("markdown stream error:", e)
+            queue.put_nowait(("error", {"error": str(e)}))
+
+    task = asyncio.create_task(run())
+    _producers.add(task)
+    task.add_done_callback(_producers.discard)
+
+    async def events():
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(event, data)
+            if event != "delta":
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stored_markdown(markdown: str, done: Optional[Any] = None) -> StreamingResponse:
+    """Replays text that was already generated, in the same event format."""
+
+    async def produce(emit: Emit):
+        await emit(markdown)
+        return done if done is not None else {"markdown": markdown}
+
+    return markdown_stream(produce)
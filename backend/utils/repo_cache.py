@@ -0,0 +1,167 @@
+import os
+import hashlib
+import tempfile
+import subprocess
+import threading
+from fnmatch import fnmatch
+from typing import List, Optional, Tuple
+
+import git
+
+from utils.workspace import (
+    CLONE_BLOB_LIMIT,
+    check_checkout_size,
+    check_remote_size,
+    enforce_quota,
+    new_workspace,
+)
+
+# Bare mirrors live here, one per repository URL. Every evaluation checks out a
+# detached worktree from the mirror instead of doing a fresh network clone.
+# Mirrors are always addressed with --git-dir, and sparse worktrees get
+# their patterns through per-worktree files and a one-off -c flag, so
+# nothing ever rewrites the mirror's own config.
+REPO_CACHE_DIR = os.getenv(
+    "REPO_CACHE_DIR", os.path.join(tempfile.gettempdir(), "evalx_repo_cache")
+)
+
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+
+# ------------ KEYS ------------
+def normalize_repo_url(url: str) -> str:
+    url = url.strip().rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    if "://" in url:
+        scheme, rest = url.split("://", 1)
+        host, _, path = rest.partition("/")
+        url = f"{scheme.lower()}://{host.lower()}/{path}"
+    return url
+
+
+def mirror_path_for(url: str) -> str:
+    key = hashlib.sha1(normalize_repo_url(url).encode("utf-8")).hexdigest()
+    return os.path.join(REPO_CACHE_DIR, key + ".git")
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        if path not in _locks:
+            _locks[path] = threading.Lock()
+        return _locks[path]
+
+
+# ------------ MIRROR ------------
+def mirror_git(mirror: str) -> git.Git:
+    g = git.Git()
+    g.set_persistent_git_options(git_dir=mirror)
+    return g
+
+
+def fetch_mirror(url: str) -> Tuple[str, str]:
+    """
+    Creates or incrementally updates the bare mirror for `url`.
+    Returns (mirror_path, head_commit_sha).
+    """
+    os.makedirs(REPO_CACHE_DIR, exist_ok=True)
+    mirror = mirror_path_for(url)
+
+    # repos grow after their first clone too, so every fetch is checked
+    check_remote_size(url)
+
+    with _lock_for(mirror):
+        if os.path.isdir(mirror):
+            g = mirror_git(mirror)
+            g.fetch("origin", "--prune")
+            # worktrees whose directories were removed by safe_rmtree
+            g.worktree("prune")
+        else:
+            # partial clone: blobs above the limit are only fetched if a
+            # checkout actually needs them
+            git.Repo.clone_from(url, mirror, mirror=True, filter=f"blob:limit={CLONE_BLOB_LIMIT}")
+            g = mirror_git(mirror)
+
+        sha = g.rev_parse("HEAD")
+
+    return mirror, sha
+
+
+def _in_sparse_set(path: str, sparse: List[str]) -> bool:
+    # the pattern shapes sparse_patterns() produces: "/dir/" anchored
+    # directories, "!**/dir/**" excluded directories at any depth and
+    # slash-free names matched against the file name; as in git, the last
+    # match wins
+    parts = path.split("/")
+    included = False
+    for pattern in sparse:
+        negated = pattern.startswith("!")
+        pattern = pattern.lstrip("!")
+        if pattern.startswith("**/") and pattern.endswith("/**"):
+            hit = pattern[3:-3] in parts[:-1]
+        elif pattern.startswith("/"):
+            hit = path.startswith(pattern[1:])
+        else:
+            hit = fnmatch(parts[-1], pattern)
+        if hit:
+            included = not negated
+    return included
+
+
+def checkout_size(mirror: str, sha: str, sparse: Optional[List[str]] = None) -> int:
+    """Bytes a checkout of `sha` (restricted to `sparse`) would write."""
+    oids = []
+    for line in mirror_git(mirror).ls_tree("-r", "--full-tree", sha).splitlines():
+        meta, _, path = line.partition("\t")
+        mode, kind, oid = meta.split()
+        if kind == "blob" and (not sparse or _in_sparse_set(path, sparse)):
+            oids.append(oid)
+    if not oids:
+        return 0
+    # only blobs that would be checked out anyway are fetched for their size
+    sizes = subprocess.run(
+        ["git", f"--git-dir={mirror}", "cat-file", "--batch-check=%(objectsize)"],
+        input="\n".join(oids) + "\n",
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return sum(int(n) for n in sizes.split() if n.isdigit())
+
+
+def checkout_worktree(mirror: str, sha: str, sparse: List[str] = None) -> str:
+    """
+    Adds a detached worktree of `sha` in a fresh workspace. The worktree
+    shares the mirror's object store, so no history is copied. With `sparse`
+    patterns only matching files are checked out. The quota is checked
+    before any file is written. Removing the directory is enough to release
+    it; the metadata is pruned on the next fetch.
+    """
+    path = new_workspace()
+
+    with _lock_for(mirror):
+        check_checkout_size(checkout_size(mirror, sha, sparse))
+        mirror_git(mirror).worktree("add", "--no-checkout", "--detach", path, sha)
+
+    worktree = git.Git(path)
+    if sparse:
+        # patterns live in the worktree's private git dir and sparse mode is
+        # switched on for this one command, never in the mirror's config
+        private = worktree.rev_parse("--absolute-git-dir")
+        os.makedirs(os.path.join(private, "info"), exist_ok=True)
+        with open(os.path.join(private, "info", "sparse-checkout"), "w", encoding="utf-8") as f:
+            f.write("\n".join(sparse) + "\n")
+        worktree.set_persistent_git_options(c="core.sparseCheckout=true")
+
+    with worktree.custom_environment(GIT_LFS_SKIP_SMUDGE="1"):
+        worktree.read_tree("-mu", "HEAD")
+
+    # last line of defence for anything the size estimate missed
+    enforce_quota(path)
+    return path
+
+
+def cached_checkout(url: str, sparse: List[str] = None) -> Tuple[str, str]:
+    mirror, sha = fetch_mirror(url)
+    return checkout_worktree(mirror, sha, sparse), sha
@@ -0,0 +1,65 @@
+import os
+import tempfile
+from typing import AsyncIterator, Optional
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from config.db import db
+
+# Rendered PDF reports, keyed by evaluation key. GridFS by default; set
+# REPORT_STORE=fs to keep them on local disk instead (single-node setups).
+
+REPORT_STORE = os.getenv("REPORT_STORE", "gridfs")
+REPORT_DIR = os.getenv("REPORT_DIR", os.path.join(tempfile.gettempdir(), "evalx_reports"))
+READ_CHUNK = 256 * 1024
+
+reports_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="reports")
+
+
+def _report_path(key: str) -> str:
+    return os.path.join(REPORT_DIR, f"{key}.pdf")
+
+
+async def save_report(key: str, data: bytes):
+    if REPORT_STORE == "fs":
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=REPORT_DIR, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, _report_path(key))
+        return
+
+    await reports_bucket.upload_from_stream(
+        f"{key}.pdf", data, metadata={"evaluationKey": key, "contentType": "application/pdf"}
+    )
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def _read_gridfs(stream) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await stream.readchunk()
+        if not chunk:
+            break
+        yield chunk
+
+
+async def open_report(key: str) -> Optional[AsyncIterator[bytes]]:
+    """Chunk iterator over the stored report, or None if it was never rendered."""
+    if REPORT_STORE == "fs":
+        path = _report_path(key)
+        return _read_file(path) if os.path.exists(path) else None
+
+    try:
+        stream = await reports_bucket.open_download_stream_by_name(f"{key}.pdf")
+    except NoFile:
+        return None
+    return _read_gridfs(stream)
@@ -0,0 +1,37 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config.db import db
+
+evaluation_results_collection = db["evaluation_results"]
+
+
+def evaluation_key(commit_sha: str, desc: str, rubric_version: str) -> str:
+    """
+    Content address of an evaluation: the same commit, project description and
+    rubric always produce the same key.
+    """
+    raw = "\x00".join([commit_sha, (desc or "").strip(), rubric_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def get_result(key: str) -> Optional[Dict[str, Any]]:
+    record = await evaluation_results_collection.find_one({"_id": key})
+    if not record:
+        return None
+    return record.get("result")
+
+
+async def put_result(key: str, commit_sha: str, rubric_version: str, result: Dict[str, Any]):
+    await evaluation_results_collection.replace_one(
+        {"_id": key},
+        {
+            "_id": key,
+            "commitSha": commit_sha,
+            "rubricVersion": rubric_version,
+            "result": result,
+            "createdAt": datetime.utcnow(),
+        },
+        upsert=True,
+    )
@@ -0,0 +1,60 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from utils.llm_scheduler import llm_priority
+
+# Request coalescing. Callers that ask for the same thing while it is still
+# being computed (four team members pressing "analyze" on the same deck)
+# await the one in-flight computation instead of starting their own. The
+# work runs as its own task, so a caller that disconnects does not cancel it
+# for the others. Nothing is kept once it finishes; later repeats are for
+# the caches (utils.llm_cache, evaluation results) to answer.
+# The shared task runs with the first caller's context, including its LLM
+# priority class, so flights are kept apart per class: a viva answer never
+# waits in the bulk queue behind a background evaluation that asked first.
+
+T = TypeVar("T")
+
+_inflight: Dict[str, asyncio.Task] = {}
+stats = {"started": 0, "coalesced": 0}
+
+
+def normalize_text(text: str) -> str:
+    # whitespace and surrounding blanks do not change what is being asked
+    return " ".join((text or "").split())
+
+
+def payload_key(namespace: str, payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return namespace + ":" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _finished(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # every caller may have gone away; retrieve the error so it is not logged as lost
+    if not task.cancelled():
+        task.exception()
+
+
+async def single_flight(key: str, fn: Callable[[], Awaitable[T]]) -> T:
+    """
+    Result of fn(), shared with every concurrent caller using the same key
+    and LLM priority class.
+    """
+    key = f"{llm_priority.get()}:{key}"
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finished(key, t))
+        stats["started"] += 1
+    else:
+        stats["coalesced"] += 1
+    return await asyncio.shield(task)
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    return {**stats, "in_flight": len(_inflight)}
@@ -1,16 +1,14 @@
 import io
-import asyncio
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
-from openai import OpenAI
 import os
 
+from utils.llm_gateway import speech
+
 OPEN_AI_KEY = os.getenv("OPEN_AI_KEY")
 if not OPEN_AI_KEY:
     raise RuntimeError("OPEN_AI_KEY missing")
 
-client = OpenAI(api_key=OPEN_AI_KEY)
-
 
 # -------------------------------
 # MAIN FUNCTION: TEXT → MP3 AUDIO
@@ -27,18 +25,12 @@ async def text_to_speech_stream(text: str):
     # Add Indian-style phrasing
     text = f"Please speak this in a natural Indian English accent: {text}"
 
-    # Blocking call offloaded to thread
-    def _call_tts():
-        resp = client.audio.speech.create(
-            model="tts-1",      # Fastest TTS model
-            voice="alloy",      # Default voice (clear, neutral)
-            format="mp3",
-            input=text,
-        )
-        return resp.read()
-
-    loop = asyncio.get_running_loop()
-    audio_bytes = await loop.run_in_executor(None, _call_tts)
+    audio_bytes = await speech(
+        text,
+        model="tts-1",      # Fastest TTS model
+        voice="alloy",      # Default voice (clear, neutral)
+        response_format="mp3",
+    )
 
     return StreamingResponse(
         io.BytesIO(audio_bytes),
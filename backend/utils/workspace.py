@@ -0,0 +1,142 @@
+import os
+import re
+import time
+import shutil
+import tempfile
+from typing import Iterable, List, Optional
+
+import httpx
+
+# Where evaluation checkouts live and how big they may get. Repos are
+# checked for size before anything is cloned, mirrors are partial clones
+# (large blobs stay on the server) and worktrees are sparse, so only the
+# files the evaluator reads are ever written to disk.
+
+WORKSPACE_DIR = os.getenv(
+    "WORKSPACE_DIR", os.path.join(tempfile.gettempdir(), "evalx_workspaces")
+)
+MAX_REPO_SIZE_MB = int(os.getenv("MAX_REPO_SIZE_MB", "500"))
+WORKSPACE_QUOTA_MB = int(os.getenv("WORKSPACE_QUOTA_MB", "200"))
+CLONE_BLOB_LIMIT = os.getenv("CLONE_BLOB_LIMIT", "1m")
+# a workspace untouched this long belongs to a job that died mid-run
+WORKSPACE_STALE_SECONDS = int(os.getenv("WORKSPACE_STALE_SECONDS", str(3 * 3600)))
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
+
+GITHUB_REPO_RE = re.compile(r"github\.com[/:]([^/]+)/([^/]+?)(?:\.git)?/?$", re.IGNORECASE)
+
+# read by the structure markers in graph.repo_index
+STRUCTURE_PATTERNS = [
+    "README*", "Readme*", "readme*",
+    "requirements.txt", "pyproject.toml", "setup.py",
+    "Dockerfile", "dockerfile",
+    "/.github/workflows/",
+]
+
+
+class WorkspaceError(Exception):
+    pass
+
+
+def sparse_patterns(exts: Iterable[str], exclude_dirs: Iterable[str] = ()) -> List[str]:
+    # non-cone (gitignore style) patterns: every file with one of `exts`
+    # anywhere in the tree plus the structure files, minus anything under
+    # one of `exclude_dirs` at any depth. Negations must come last, and must
+    # match the files (**/dir/**): sparse checkout ignores "!dir/".
+    return (
+        [f"*{ext}" for ext in sorted(set(exts))]
+        + STRUCTURE_PATTERNS
+        + [f"!**/{d}/**" for d in sorted(set(exclude_dirs))]
+    )
+
+
+# ------------ REMOTE SIZE ------------
+def remote_size_mb(url: str) -> Optional[float]:
+    """Repository size reported by the GitHub API, or None when unknown."""
+    m = GITHUB_REPO_RE.search(url.strip())
+    if not m:
+        return None
+
+    headers = {"Accept": "application/vnd.github+json"}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
+    try:
+        r = httpx.get(
+            f"https://api.github.com/repos/{m.group(1)}/{m.group(2)}",
+            headers=headers,
+            timeout=10,
+        )
+        if r.status_code != 200:
+            return None
+        # the API reports kilobytes
+        return r.json().get("size", 0) / 1024
+    except Exception as e:
+        print("GitHub size check error:", e)
+        return None
+
+
+def check_remote_size(url: str):
+    size = remote_size_mb(url)
+    if size is not None and size > MAX_REPO_SIZE_MB:
+        raise WorkspaceError(
+            f"Repository is {size:.0f} MB, above the {MAX_REPO_SIZE_MB} MB limit"
+        )
+
+
+# ------------ WORKSPACES ------------
+def new_workspace() -> str:
+    """Reserved path for a checkout; the directory itself does not exist yet."""
+    os.makedirs(WORKSPACE_DIR, exist_ok=True)
+    path = tempfile.mkdtemp(prefix="repo_", dir=WORKSPACE_DIR)
+    os.rmdir(path)
+    return path
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+
+def check_checkout_size(size_bytes: int):
+    """Refuses a checkout before it is written when its files exceed the quota."""
+    size = size_bytes / (1024 * 1024)
+    if size > WORKSPACE_QUOTA_MB:
+        raise WorkspaceError(
+            f"Checkout would use {size:.0f} MB, above the {WORKSPACE_QUOTA_MB} MB workspace quota"
+        )
+
+
+def enforce_quota(path: str):
+    used = disk_usage(path) / (1024 * 1024)
+    if used > WORKSPACE_QUOTA_MB:
+        shutil.rmtree(path, ignore_errors=True)
+        raise WorkspaceError(
+            f"Checkout uses {used:.0f} MB, above the {WORKSPACE_QUOTA_MB} MB workspace quota"
+        )
+
+
+def cleanup_stale_workspaces() -> int:
+    """Removes workspaces left behind by crashed jobs. Returns how many."""
+    if not os.path.isdir(WORKSPACE_DIR):
+        return 0
+
+    cutoff = time.time() - WORKSPACE_STALE_SECONDS
+    removed = 0
+    for entry in os.scandir(WORKSPACE_DIR):
+        try:
+            if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed